@@ -8,17 +8,40 @@ from __future__ import print_function, division
 import aipy
 import ephem
 import numpy
-from datetime import datetime
-from multiprocessing import Pool
-from scipy.optimize import leastsq
+from functools import lru_cache
+from multiprocessing import Pool, cpu_count
+from scipy.optimize import leastsq, least_squares
 
 from lsl.common import stations
 from lsl.sim.vis import SOURCES as simSrcs
-from lsl.common.mcs import apply_pointing_correction
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    # Numba is optional and only used to speed up fitDataWithRotation
+    _HAS_NUMBA = False
 
 __version__ = "0.2"
 __all__ = ['getSources', 'getAIPYSources', 'parse', 'fitDriftscan', 'fitDecOffset',
-           'fitDataWithRotation']
+           'fitDataWithRotation', 'refineDataWithRotation']
+
+
+# Fields in the structured array returned by parse.  All angles are in
+# radians.
+_RESULTS_DTYPE = numpy.dtype([('name', 'U16'), ('date', 'U24'), ('freq_MHz', 'f8'),
+                              ('raError', 'f8'), ('decError', 'f8'), ('SEFD', 'f8'), 
+                              ('FWHM', 'f8'), ('zenithAngle', 'f8'), ('az', 'f8'), 
+                              ('el', 'f8'), ('correctedAz', 'f8'), ('correctedEl', 'f8')])
+
+
+# Gaussian exponent scale for a profile parameterized by its FWHM
+_FOUR_LN2 = 4*numpy.log(2)
+
+
+# Maximum number of grid point/data point pairs to evaluate at once in 
+# fitDataWithRotation
+_GRID_BLOCK_SIZE = 2**20
 
 
 # List of bright radio sources and pulsars in PyEphem format
@@ -60,7 +83,8 @@ class RadioBodyBaars:
         each time step before accessing information.
         """
 
-        flux = 10**(self.a + self.b*numpy.log10(afreqs/self.mfreq) + self.c*numpy.log10(afreqs/self.mfreq)**2)
+        lx = numpy.log10(afreqs/self.mfreq)
+        flux = 10**(self.a + lx*(self.b + self.c*lx))
         flux *= (1 + self.secularChange)**(epoch-self.secularEpoch)
         
         self.jys = flux
@@ -94,8 +118,8 @@ class RadioFixedBodyBaars(aipy.phs.RadioFixedBody, RadioBodyBaars):
         RadioBodyBaars.__init__(self, a, b, c, secularChange=secularChange, secularEpoch=secularEpoch)
         
     def compute(self, observer, afreqs=74e-3):
-        epoch = datetime.strptime(str(observer.date), "%Y/%m/%d %H:%M:%S")
-        epoch = epoch.year + float(epoch.strftime("%j")) / 365
+        # Fractional year in Julian years since J2000
+        epoch = 2000.0 + (float(observer.date) - float(ephem.J2000)) / 365.25
 
         aipy.phs.RadioFixedBody.compute(self, observer)
         try:
@@ -104,9 +128,16 @@ class RadioFixedBodyBaars(aipy.phs.RadioFixedBody, RadioBodyBaars):
             self.update_jys(afreqs, epoch=epoch)
 
 
+@lru_cache(maxsize=1)
 def getSources():
     """
     Return a dictionary of PyEphem sources.
+    
+    .. note::
+        The dictionary is built once and the same instance is returned by
+        every call.  The sources should be (re)computed before their 
+        positions are used and the dictionary should be deep copied before
+        it is modified or shared between threads.
     """
     
     srcs = {}
@@ -117,6 +148,7 @@ def getSources():
     return srcs
 
 
+@lru_cache(maxsize=1)
 def getAIPYSources():
     """
     Return a dictionary of AIPY sources.
@@ -126,6 +158,10 @@ def getAIPYSources():
         contained in lsl.sim.vis.srcs.  First, this dictionary has source 
         names that are consistent with those returned by the getSources()
         function.  Second, this list contains 3C123.
+        
+    .. note::
+        As with getSources(), the dictionary is built once and the same 
+        instance is returned by every call.
     """
     
     newSrcs = {}
@@ -155,19 +191,31 @@ def getAIPYSources():
 
 
 def parse(filename, station=stations.lwa1):
+    """
+    Parse a results file from a collection of pointing checks and return
+    a structured array with one record per line.  The fields are listed in
+    _RESULTS_DTYPE and all angles are stored as radians.
+    """
+    
     # Get a list of sources to compare with
     srcs = getSources()
     
     # Get an observer for the station
     obs = station.get_observer()
     
-    # Open the file and run with it
+    # Caches of parsed dates and true source positions keyed by (source, 
+    # date), and a body that is re-used for the "expected" source positions
+    dates = {}
+    positions = {}
+    correctedSrc = ephem.FixedBody()
+    
+    # Read in the file all at once and run with it
     fh = open(filename, 'r')
+    lines = fh.read().split('\n')
+    fh.close()
     
     data = []
-    for line in fh:
-        line = line.replace('\n', '')
-        
+    for line in lines:
         # Skip over comments and blank lines
         if len(line) < 3:
             continue
@@ -210,23 +258,28 @@ def parse(filename, station=stations.lwa1):
         entry['zenithAngle'] = ephem.degrees(zenithAngle)
         
         ## Compute the true az/el of the source
-        obs.date = entry['date']
-        srcs[srcName].compute(obs)
-        entry['az'] = srcs[srcName].az
-        entry['el'] = srcs[srcName].alt
-        
+        try:
+            obs.date = dates[entry['date']]
+        except KeyError:
+            obs.date = dates[entry['date']] = ephem.Date(entry['date'])
+        try:
+            entry['az'], entry['el'] = positions[(srcName, entry['date'])]
+        except KeyError:
+            srcs[srcName].compute(obs)
+            entry['az'] = srcs[srcName].az
+            entry['el'] = srcs[srcName].alt
+            positions[(srcName, entry['date'])] = (entry['az'], entry['el'])
+            
         ## Compute the az/el for the "expected" source location
-        correctedSrc = ephem.FixedBody()
         correctedSrc._ra  = srcs[srcName]._ra  + entry['raError']
         correctedSrc._dec = srcs[srcName]._dec + entry['decError']
         correctedSrc.compute(obs)
         entry['correctedAz'] = correctedSrc.az
         entry['correctedEl'] = correctedSrc.alt
         
-        data.append( entry )
-    fh.close()
-    
-    return data
+        data.append( tuple(entry[key] for key in _RESULTS_DTYPE.names) )
+        
+    return numpy.array(data, dtype=_RESULTS_DTYPE)
 
 
 def _driftscanFunction(p, x):
@@ -239,7 +292,15 @@ def _driftscanFunction(p, x):
     except IndexError:
         slope = 0.0
     
-    y = height*numpy.exp(-4*numpy.log(2)*(x - center)**2/width**2 ) + slope*x + offset
+    # Evaluate the model in place to avoid the temporary arrays
+    y = x - center
+    y *= y
+    y *= -_FOUR_LN2/width**2
+    numpy.exp(y, out=y)
+    y *= height
+    y += offset
+    if slope != 0.0:
+        y += slope*x
     return y
 
 
@@ -248,6 +309,24 @@ def _driftscanErrorFunction(p, x, y):
     return y - yFit 
 
 
+def _driftscanErrorJacobian(p, x, y):
+    height = p[0]
+    center = p[1]
+    width  = p[2]
+    
+    g = numpy.exp(-_FOUR_LN2*(x - center)**2/width**2 )
+    dg = 2*_FOUR_LN2*height*g*(x - center)/width**2
+    
+    jac = numpy.empty((x.size, len(p)))
+    jac[:,0] = -g
+    jac[:,1] = -dg
+    jac[:,2] = -dg*(x - center)/width
+    jac[:,3] = -1.0
+    if len(p) > 4:
+        jac[:,4] = -x
+    return jac
+
+
 def fitDriftscan(t, power, includeLinear=False):
     """
     Given an array of times and and array of total power from a drift scan, 
@@ -262,7 +341,7 @@ def fitDriftscan(t, power, includeLinear=False):
     gp = [power.max()-power.min(), t.mean(), 1000, power.min()]
     if includeLinear:
         gp.append(0.0)
-    gp, status = leastsq(_driftscanErrorFunction, gp, (t, power))
+    gp, status = leastsq(_driftscanErrorFunction, gp, (t, power), Dfun=_driftscanErrorJacobian)
     
     tPeak = gp[1]
     sefdMetric = gp[3]/gp[0]
@@ -283,7 +362,13 @@ def _decFunction(p, x, fwhm):
     offset = p[2]
     width = fwhm
     
-    y = height*numpy.exp(-4*numpy.log(2)*(x - center)**2/width**2 ) + offset
+    # Evaluate the model in place to avoid the temporary arrays
+    y = x - center
+    y *= y
+    y *= -_FOUR_LN2/width**2
+    numpy.exp(y, out=y)
+    y *= height
+    y += offset
     return y
 
 
@@ -292,6 +377,20 @@ def _decErrorFunction(p, x, y, fwhm):
     return y - yFit 
 
 
+def _decErrorJacobian(p, x, y, fwhm):
+    height = p[0]
+    center = p[1]
+    width = fwhm
+    
+    g = numpy.exp(-_FOUR_LN2*(x - center)**2/width**2 )
+    
+    jac = numpy.empty((x.size, 3))
+    jac[:,0] = -g
+    jac[:,1] = -2*_FOUR_LN2*height*g*(x - center)/width**2
+    jac[:,2] = -1.0
+    return jac
+
+
 def fitDecOffset(decs, powers, fwhm=2.0):
     """
     Given an array of declination offsets from the source and the peak 
@@ -305,108 +404,368 @@ def fitDecOffset(decs, powers, fwhm=2.0):
     """
     
     gp = [powers.max()-powers.min(), 0.0, powers.min()]
-    gp, status = leastsq(_decErrorFunction, gp, (decs, powers, fwhm))
+    gp, status = leastsq(_decErrorFunction, gp, (decs, powers, fwhm), Dfun=_decErrorJacobian)
     
     return gp[1]
 
 
-def _rotationErrorFunction(data, theta, phi, psi, verbose=False):
-    error = 0.0
-    count = 0
+def findTransit(observer, src, az, el, t, step=60):
+    """
+    Given an observer, a source, the azimuth and elevation of a pointing, and
+    an array of UNIX times, find the time at which the source passes closest
+    to the pointing.  The separation is first checked every step samples and
+    then at every sample within step of the closest of those.  Returns the
+    time of closest approach.
+    
+    .. note::
+        The path of a source across the sky has at most one minimum and one
+        maximum separation from a fixed azimuth and elevation per day, so the
+        coarse search always lands within step samples of the true minimum.
+    """
+    
+    # Whole-second Dublin Julian Dates for each sample
+    djd = numpy.floor(t)/86400.0 + 25567.5
     
-    for entry in data:
-        srcName = entry['name']
-        az = float(entry['az']) * 180.0/numpy.pi
-        el = float(entry['el']) * 180.0/numpy.pi
+    def sampleSeparation(i):
+        observer.date = djd[i]
+        src.compute(observer)
+        return ephem.separation((src.az, src.alt), (az, el))
         
-        azP, elP = apply_pointing_correction(az, el, theta, phi, psi, degrees=True)
-        azP = ephem.degrees(azP * numpy.pi/180.0)
-        elP = ephem.degrees(elP * numpy.pi/180.0)
+    if len(t) == 0:
+        return 0.0
         
-        sep = ephem.separation((entry['correctedAz'],entry['correctedEl']), (azP,elP))
-        if verbose:
-            print("%s with a separation of %s" % (srcName, sep))
+    # Coarse search, always including the last sample
+    coarse = list(range(0, len(t), step))
+    if coarse[-1] != len(t)-1:
+        coarse.append(len(t)-1)
+    best = min(coarse, key=sampleSeparation)
+    
+    # Fine search around the best coarse sample
+    bestT = 0.0
+    bestV = 1e6
+    for i in range(max(0, best-step), min(len(t), best+step+1)):
+        sep = sampleSeparation(i)
+        if sep < bestV:
+            bestT = t[i]
+            bestV = sep
             
-        error += sep**2
-        count += 1
-        
-    return numpy.sqrt(error / float(count))
+    return bestT
+
+
+def _rotationSeparation(data, theta, phi, psi):
+    """
+    Given an array of observer pointing errors and a theta, phi, and psi 
+    rotation-about-an-axis in degrees, return an array of the separations in
+    radians between the "expected" positions and the rotated observed
+    positions.
+    """
+    
+    return _collapsedRotationSeparation(_collapseData(data), theta, phi, psi)
+
+
+def _collapsedRotationSeparation(dataCollapsed, theta, phi, psi):
+    """
+    Version of _rotationSeparation that works on a (N,4) array of observed 
+    and "expected" azimuths and elevations in radians.
+    """
+    
+    deg2rad = numpy.pi/180.0
+    
+    # Apply the correction to the observed positions and find the separation
+    # from the "expected" positions
+    rot = _getRotationMatrix(theta*deg2rad, phi*deg2rad, psi*deg2rad)
+    xyzP = numpy.dot(rot, _azEl2xyz(dataCollapsed[:,0], dataCollapsed[:,1]))
+    xyzC = _azEl2xyz(dataCollapsed[:,2], dataCollapsed[:,3])
+    
+    return numpy.arccos(numpy.clip((xyzP*xyzC).sum(axis=0), -1.0, 1.0))
+
+
+def _rotationErrorFunction(data, theta, phi, psi, verbose=False):
+    sep = _rotationSeparation(data, theta, phi, psi)
+    if verbose:
+        for entry,s in zip(data, sep):
+            print("%s with a separation of %s" % (entry['name'], ephem.degrees(s)))
+            
+    return numpy.sqrt((sep**2).mean())
+
+
+def _azEl2xyz(az, el):
+    """
+    Convert azimuth and elevation values in radians into topocentric unit
+    vectors using the same (east, north, up) convention as AIPY/LSL.  The
+    vectors are stored along the first axis of the returned array.
+    """
+    
+    cosEl = numpy.cos(el)
+    return numpy.array([cosEl*numpy.sin(az), cosEl*numpy.cos(az), numpy.sin(el)])
+
+
+def _getRotationMatrix(theta, phi, psi):
+    """
+    Array-aware version of lsl.common.mcs._get_rotation_matrix that builds
+    the rotation-about-an-axis matrix for the provided theta, phi, and psi
+    values in radians.  The values are broadcast against each other and the
+    3x3 matrices are stored along the last two axes of the returned array.
+    The trigonometric functions are evaluated before broadcasting so that
+    only the unique angles along each axis are computed.
+    """
+    
+    theta, phi, psi = numpy.asarray(theta), numpy.asarray(phi), numpy.asarray(psi)
+    
+    # Axis
+    sinTheta = numpy.sin(theta)
+    ux = numpy.cos(phi)*sinTheta
+    uy = numpy.sin(phi)*sinTheta
+    uz = numpy.cos(theta)
+    
+    # Rotation matrix
+    c = numpy.cos(psi)
+    s = numpy.sin(psi)
+    t = 1 - c
+    rot = numpy.empty(numpy.broadcast(theta, phi, psi).shape+(3,3))
+    rot[...,0,0] = c + t*ux*ux
+    rot[...,0,1] = t*ux*uy - s*uz
+    rot[...,0,2] = t*ux*uz + s*uy
+    rot[...,1,0] = t*uy*ux + s*uz
+    rot[...,1,1] = c + t*uy*uy
+    rot[...,1,2] = t*uy*uz - s*ux
+    rot[...,2,0] = t*uz*ux - s*uy
+    rot[...,2,1] = t*uz*uy + s*ux
+    rot[...,2,2] = c + t*uz*uz
+    
+    return rot
 
 
-def _rotationErrorFunctionPool(data, theta, phi, psis):
-    rmss = []
+def _rotationErrorGrid(data, thetas, phis, psis):
+    """
+    Given a (N,4) array of observed and "expected" azimuths and elevations
+    in radians, and arrays of theta, phi, and psi values in degrees, compute
+    the RMS of the pointing error after correction for every point on the
+    theta/phi/psi grid.  Returns a 3-D array of RMS values in radians.
+    """
+    
+    deg2rad = numpy.pi/180.0
     
-    for psi in psis:
-        error = 0.0
-        count = 0
+    # Unit vectors for the observed and "expected" source positions.  Since
+    # the separation only depends on the dot product between the rotated 
+    # observed position and the "expected" position, collapse the pair into
+    # a (3,3,N) set of outer products that the rotation matrices can be 
+    # contracted against directly.
+    xyz = _azEl2xyz(data[:,0], data[:,1])
+    xyzC = _azEl2xyz(data[:,2], data[:,3])
+    pairs = xyzC[:,None,:]*xyz[None,:,:]
+    
+    # Rotation matrices over the full grid
+    rot = _getRotationMatrix(numpy.asarray(thetas)[:,None,None]*deg2rad,
+                             numpy.asarray(phis)[None,:,None]*deg2rad,
+                             numpy.asarray(psis)[None,None,:]*deg2rad)
+                             
+    # Separation between the rotated and "expected" positions
+    cosSep = numpy.tensordot(rot, pairs, axes=([-2,-1], [0,1]))
+    sep = numpy.arccos(numpy.clip(cosSep, -1.0, 1.0))
+    
+    return numpy.sqrt((sep**2).mean(axis=-1))
+
+
+if _HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _rotationErrorGridNumba(data, thetas, phis, psis):
+        """
+        Compiled version of _rotationErrorGrid that walks the theta/phi/psi
+        grid in parallel without building the intermediate arrays.
+        """
+        
+        deg2rad = numpy.pi/180.0
+        nTheta, nPhi, nPsi, nData = thetas.size, phis.size, psis.size, data.shape[0]
+        
+        # Unit vectors for the observed and "expected" source positions
+        xyz = numpy.empty((nData,3))
+        xyzC = numpy.empty((nData,3))
+        for m in range(nData):
+            xyz[m,0] = numpy.cos(data[m,1])*numpy.sin(data[m,0])
+            xyz[m,1] = numpy.cos(data[m,1])*numpy.cos(data[m,0])
+            xyz[m,2] = numpy.sin(data[m,1])
+            xyzC[m,0] = numpy.cos(data[m,3])*numpy.sin(data[m,2])
+            xyzC[m,1] = numpy.cos(data[m,3])*numpy.cos(data[m,2])
+            xyzC[m,2] = numpy.sin(data[m,3])
+            
+        # Sine/cosine tables for the grid axes
+        sinTheta, cosTheta = numpy.sin(thetas*deg2rad), numpy.cos(thetas*deg2rad)
+        sinPhi, cosPhi = numpy.sin(phis*deg2rad), numpy.cos(phis*deg2rad)
+        sinPsi, cosPsi = numpy.sin(psis*deg2rad), numpy.cos(psis*deg2rad)
         
-        for i in range(data.shape[0]):
-            az = data[i,0]
-            el = data[i,1]
-            correctedAz = ephem.degrees(data[i,2] * numpy.pi/180.0)
-            correctedEl = ephem.degrees(data[i,3] * numpy.pi/180.0)
+        rmss = numpy.empty((nTheta,nPhi,nPsi))
+        for g in prange(nTheta*nPhi*nPsi):
+            i = g // (nPhi*nPsi)
+            j = (g // nPsi) % nPhi
+            k = g % nPsi
             
-            azP, elP = apply_pointing_correction(az, el, theta, phi, psi, degrees=True)
-            azP = ephem.degrees(azP * numpy.pi/180.0)
-            elP = ephem.degrees(elP * numpy.pi/180.0)
+            # Axis
+            ux = cosPhi[j]*sinTheta[i]
+            uy = sinPhi[j]*sinTheta[i]
+            uz = cosTheta[i]
             
-            sep = ephem.separation((correctedAz,correctedEl), (azP,elP))
+            # Rotation matrix
+            c = cosPsi[k]
+            s = sinPsi[k]
+            t = 1 - c
+            r00, r01, r02 = c + t*ux*ux, t*ux*uy - s*uz, t*ux*uz + s*uy
+            r10, r11, r12 = t*uy*ux + s*uz, c + t*uy*uy, t*uy*uz - s*ux
+            r20, r21, r22 = t*uz*ux - s*uy, t*uz*uy + s*ux, c + t*uz*uz
             
-            error += sep**2
-            count += 1
+            # Separation between the rotated and "expected" positions
+            error = 0.0
+            for m in range(nData):
+                x = r00*xyz[m,0] + r01*xyz[m,1] + r02*xyz[m,2]
+                y = r10*xyz[m,0] + r11*xyz[m,1] + r12*xyz[m,2]
+                z = r20*xyz[m,0] + r21*xyz[m,1] + r22*xyz[m,2]
+                cosSep = min(1.0, max(-1.0, x*xyzC[m,0] + y*xyzC[m,1] + z*xyzC[m,2]))
+                sep = numpy.arccos(cosSep)
+                error += sep*sep
+            rmss[i,j,k] = numpy.sqrt(error / nData)
             
-        rmss.append( numpy.sqrt(error / float(count)) )
+        return rmss
+
+
+def _collapseData(data):
+    """
+    Collapse an array of observer pointing errors from parse into a (N,4) 
+    array of observed and "expected" azimuths and elevations in radians.
+    """
+    
+    return numpy.stack([data['az'], data['el'], data['correctedAz'], data['correctedEl']], axis=1)
+
+
+# Collapsed data set for the worker processes used by fitDataWithRotation
+_workerData = None
+
+
+def _initRotationWorker(dataCollapsed):
+    """
+    Pool initializer that stores the collapsed data set in each worker so 
+    that it is only sent once rather than with every task.
+    """
+    
+    global _workerData
+    _workerData = dataCollapsed
+
+
+def _rotationErrorGridWorker(args):
+    """
+    Pool worker that runs _rotationErrorGrid on the stored data set for a
+    (thetas, phis, psis) tuple.
+    """
+    
+    return _rotationErrorGrid(_workerData, *args)
+
+
+def _fitGrid(dataCollapsed, thetas, phis, psis, taskPool=None):
+    """
+    Search a theta/phi/psi grid for the best-fit rotation-about-an-axis
+    using the provided collapsed data set.  Returns a four-element tuple of 
+    theta, phi, psi, and pointing RMS in degrees.
+    """
+    
+    thetas = numpy.asarray(thetas, dtype=numpy.float64)
+    phis = numpy.asarray(phis, dtype=numpy.float64)
+    psis = numpy.asarray(psis, dtype=numpy.float64)
+    
+    # Work through the grid a few thetas at a time so that the intermediate
+    # arrays stay a reasonable size
+    nBlock = max(1, _GRID_BLOCK_SIZE // (phis.size*psis.size*dataCollapsed.shape[0]))
+    blocks = [thetas[i:i+nBlock] for i in range(0, thetas.size, nBlock)]
+    
+    if _HAS_NUMBA:
+        rmss = _rotationErrorGridNumba(dataCollapsed, thetas, phis, psis)
         
-    return numpy.array(rmss)
+    elif taskPool is not None:
+        taskList = [(block, phis, psis) for block in blocks]
+        chunksize = max(1, len(taskList) // (4*cpu_count()))
+        rmss = numpy.concatenate(taskPool.map(_rotationErrorGridWorker, taskList, chunksize=chunksize), axis=0)
+        
+    else:
+        rmss = numpy.concatenate([_rotationErrorGrid(dataCollapsed, block, phis, psis) for block in blocks], axis=0)
+        
+    # Find the best fit
+    b = numpy.unravel_index(rmss.argmin(), rmss.shape)
+    best = (thetas[b[0]], phis[b[1]], psis[b[2]])
+    bestValue = rmss[b]
+    
+    return best[0], best[1], best[2], bestValue * 180.0/numpy.pi
+
+
+def _polishFit(dataCollapsed, theta, phi, psi):
+    """
+    Refine a theta/phi/psi rotation-about-an-axis in degrees with a least
+    squares fit to the separations between the rotated observed positions
+    and the "expected" positions.  Returns a four-element tuple of theta, 
+    phi, psi, and pointing RMS in degrees.
+    """
+    
+    fit = least_squares(lambda p: _collapsedRotationSeparation(dataCollapsed, *p), 
+                        [theta, phi, psi], method='trf')
+    theta, phi, psi = fit.x
+    rms = numpy.sqrt((fit.fun**2).mean())
+    
+    return theta, phi, psi, rms * 180.0/numpy.pi
 
 
-def fitDataWithRotation(data, thetas, phis, psis, usePool=False):
+def fitDataWithRotation(data, thetas, phis, psis, usePool=False, polish=False):
     """
-    Given a list of observer pointing errors, and lists of theta, phi
+    Given an array of observer pointing errors, and lists of theta, phi
     and psi values, fit the data with a rotation-abount-an-axis and return
-    a four-element tuple of theta, phi, psi, and pointing RMS.
+    a four-element tuple of theta, phi, psi, and pointing RMS.  If polish 
+    is True the best grid point is used as the starting point for a least 
+    squares fit.
+    
+    .. note::
+        If Numba is available the grid is evaluated with a compiled, 
+        multi-threaded kernel and usePool is ignored.
     """
     
-    if usePool:
-        taskPool = Pool()
-        taskList = []
+    for best in refineDataWithRotation(data, thetas, phis, psis, usePool=usePool, polish=polish):
+        pass
         
-        dataCollapsed = numpy.zeros((len(data),4))
-        for i,entry in enumerate(data):
-            dataCollapsed[i,0] = float(entry['az']) * 180.0/numpy.pi
-            dataCollapsed[i,1] = float(entry['el']) * 180.0/numpy.pi
-            dataCollapsed[i,2] = float(entry['correctedAz']) * 180.0/numpy.pi
-            dataCollapsed[i,3] = float(entry['correctedEl']) * 180.0/numpy.pi
-            
-        for theta in thetas:
-            for phi in phis:
-                task = taskPool.apply_async(_rotationErrorFunctionPool, args=(dataCollapsed, theta, phi, psis))
-                taskList.append( (theta,phi,task) )
-        taskPool.close()
-        taskPool.join()
+    return best
+
+
+def refineDataWithRotation(data, thetas, phis, psis, refinements=(), usePool=False, polish=False):
+    """
+    Given an array of observer pointing errors, and lists of theta, phi
+    and psi values, fit the data with a rotation-abount-an-axis and then
+    zoom in on the best fit.  The zoom levels are given by refinements, a
+    sequence of ((theta half-width, theta step), (phi half-width, phi step),
+    (psi half-width, psi step)) tuples in degrees.  This is a generator that
+    yields a four-element tuple of theta, phi, psi, and pointing RMS for the
+    initial grid and for each refinement level.  If polish is True a final
+    tuple is yielded from a least squares fit that starts at the best grid
+    point.
+    
+    .. note::
+        The data are collapsed, and the pool started, once for all levels.
+        If Numba is available the grids are evaluated with a compiled, 
+        multi-threaded kernel and usePool is ignored.
+    """
+    
+    dataCollapsed = _collapseData(data)
+    
+    taskPool = None
+    if usePool and not _HAS_NUMBA:
+        taskPool = Pool(initializer=_initRotationWorker, initargs=(dataCollapsed,))
+        
+    try:
+        best = _fitGrid(dataCollapsed, thetas, phis, psis, taskPool=taskPool)
+        yield best
         
-        bestValue = 1e6
-        best = None
-        for theta,phi,task in taskList:
-            rmss = task.get()
+        for level in refinements:
+            grids = [numpy.arange(center-width, center+width, step) for center,(width,step) in zip(best[:3], level)]
+            best = _fitGrid(dataCollapsed, *grids, taskPool=taskPool)
+            yield best
             
-            if rmss.min() < bestValue:
-                b = numpy.where( rmss == rmss.min() )[0][0]
-                psi = psis[b]
-                
-                best = (theta,phi,psi)
-                bestValue = rmss.min()
-                
-    else:
-        bestValue = 1e6
-        best = None
-        for theta in thetas:
-            for phi in phis:
-                for psi in psis:
-                    rms = _rotationErrorFunction(data, theta, phi, psi)
-                    
-                    if rms < bestValue:
-                        best = (theta, phi, psi)
-                        bestValue = rms
-                        
-    return best[0], best[1], best[2], bestValue * 180.0/numpy.pi
+        if polish:
+            yield _polishFit(dataCollapsed, *best[:3])
+            
+    finally:
+        if taskPool is not None:
+            taskPool.close()
+            taskPool.join()
@@ -12,17 +12,16 @@ Usage:
 
 import os
 import sys
+import copy
 import time
-import ephem
 import numpy
 import argparse
 from aipy import coord
 from scipy.stats import pearsonr
 
 from lsl.common import stations
-from lsl.common.mcs import apply_pointing_correction
 
-from analysis import parse, fitDataWithRotation, _rotationErrorFunction
+from analysis import parse, refineDataWithRotation, _rotationErrorFunction, _rotationSeparation
 
 from matplotlib import pyplot as plt
 
@@ -40,33 +39,24 @@ def main(args):
             observer = stations.lwana.get_observer()
         except AttributeError:
             ## Catch for older LSL
-            station = stations.lwa1
+            station = copy.copy(stations.lwa1)
             station.name = 'LWA-NA'
             station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
-    elif sta == 'ovrolwa':
-        station = stations.lwa1
+    elif args.ovrolwa:
+        station = copy.copy(stations.lwa1)
         station.name = 'OVRO-LWA'
         station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
     print("Station: %s" % station.name)
     print(" ")
     
     # Load in the data
-    data = []
-    for filename in filenames:
-        data.extend( parse(filename, station=station) )
-        
+    data = numpy.concatenate([parse(filename, station=station) for filename in filenames])
+    
     # Split by frequency
-    freqs = []
-    for entry in data:
-        if entry['freq_MHz'] not in freqs:
-            freqs.append( entry['freq_MHz'] )
     groups = {}
-    for freq in freqs:
-        groups[freq] = []
-        for entry in data:
-            if entry['freq_MHz'] == freq:
-                groups[freq].append( entry )
-                
+    for freq in numpy.unique(data['freq_MHz']):
+        groups[freq] = data[data['freq_MHz'] == freq]
+        
     # Go!
     for freq,data in groups.items():
         if len(groups) > 1:
@@ -82,43 +72,25 @@ def main(args):
         print("  Psi:   None applied")
         print("  -> RMS: %.3f degrees" % bestRMS)
         
-        ## Fit the pointing correction
-        t0 = time.time()
+        ## Fit the pointing correction - an initial coarse grid followed by two
+        ## levels of refinement around the best fit and a final least squares
+        ## fit
         thetas = numpy.arange(0.0, 90.0, 2.0)
         phis = numpy.arange(0.0, 360.0, 2.0)
         psis = numpy.arange(-10.0, 10.0, 1.0)
-        bestTheta, bestPhi, bestPsi, bestRMS = fitDataWithRotation(data, thetas, phis, psis, usePool=True)
-        t1 = time.time()
-        print("Level 1 (%.1f s):" % (t1-t0,))
-        print("  Theta: %.1f degrees" % bestTheta)
-        print("  Phi:   %.1f degrees" % bestPhi)
-        print("  Psi:   %.1f degrees" % bestPsi)
-        print("  -> RMS: %.3f degrees" % bestRMS)
-        
-        t0 = time.time()
-        thetas = numpy.arange(bestTheta-4.0, bestTheta+4.0, 1.0)
-        phis = numpy.arange(bestPhi-4.0, bestPhi+4.0, 1.0)
-        psis = numpy.arange(bestPsi-2.0, bestPsi+2.0, 0.5)
-        bestTheta, bestPhi, bestPsi, bestRMS = fitDataWithRotation(data, thetas, phis, psis, usePool=True)
-        t1 = time.time()
-        print("Level 2 (%.1f s):" % (t1-t0,))
-        print("  Theta: %.1f degrees" % bestTheta)
-        print("  Phi:   %.1f degrees" % bestPhi)
-        print("  Psi:   %.1f degrees" % bestPsi)
-        print("  -> RMS: %.3f degrees" % bestRMS)
-        
+        refinements = (((4.0, 1.0), (4.0, 1.0), (2.0, 0.5)),
+                       ((2.0, 0.1), (2.0, 0.1), (1.0, 0.1)))
         t0 = time.time()
-        thetas = numpy.arange(bestTheta-2.0, bestTheta+2.0, 0.1)
-        phis = numpy.arange(bestPhi-2.0, bestPhi+2.0, 0.1)
-        psis = numpy.arange(bestPsi-1.0, bestPsi+1.0, 0.1)
-        bestTheta, bestPhi, bestPsi, bestRMS = fitDataWithRotation(data, thetas, phis, psis, usePool=True)
-        t1 = time.time()
-        print("Level 3 (%.1f s):" % (t1-t0,))
-        print("  Theta: %.1f degrees" % bestTheta)
-        print("  Phi:   %.1f degrees" % bestPhi)
-        print("  Psi:   %.1f degrees" % bestPsi)
-        print("  -> RMS: %.3f degrees" % bestRMS)
-        
+        for level,best in enumerate(refineDataWithRotation(data, thetas, phis, psis, refinements, usePool=True, polish=True)):
+            bestTheta, bestPhi, bestPsi, bestRMS = best
+            t1 = time.time()
+            print("Level %i (%.1f s):" % (level+1, t1-t0))
+            print("  Theta: %.1f degrees" % bestTheta)
+            print("  Phi:   %.1f degrees" % bestPhi)
+            print("  Psi:   %.1f degrees" % bestPsi)
+            print("  -> RMS: %.3f degrees" % bestRMS)
+            t0 = t1
+            
         ## Plot
         fig = plt.figure()
         ax1  = fig.add_subplot(3, 1, 1)
@@ -127,23 +99,15 @@ def main(args):
         ax3  = fig.add_subplot(3, 1, 3)
         
         ### Figure 1 - Total pointing error as a function of zenith angle
-        zeniths = []
-        errors = []
-        for entry in data:
-            z = float(entry['zenithAngle']) * 180.0/numpy.pi
-            e = ephem.separation((entry['az'],entry['el']), (entry['correctedAz'],entry['correctedEl']))
-            e *= 180.0/numpy.pi
-            ax1.plot(z, e, linestyle=' ', marker='^', color='blue')
-            ax1.text(z, e, entry['name'])
-            
-            zeniths.append(z)
-            errors.append(e)
+        zeniths = numpy.rad2deg(data['zenithAngle'])
+        errors = numpy.rad2deg(_rotationSeparation(data, 0.0, 0.0, 0.0))
+        ax1.plot(zeniths, errors, linestyle=' ', marker='^', color='blue')
+        for name,z,e in zip(data['name'], zeniths, errors):
+            ax1.text(z, e, name)
         ### Figure 1 - Plot range and labels
         ax1.set_xlabel('Zenith Angle [$^\\circ$]')
         ax1.set_ylabel('Pointing Error [$^\\circ$]')
         ### Figure 1 - Report
-        zeniths = numpy.array(zeniths)
-        errors = numpy.array(errors)
         fit = numpy.polyfit(zeniths, errors, 1)
         print("Raw Offsets:")
         print("  Mean Error: %.3f degrees" % errors.mean())
@@ -152,15 +116,13 @@ def main(args):
         print("  Error R-Value: %.3f" % pearsonr(zeniths, errors)[0])
         
         ### Figure 2 (a) and 2(b) - Pointing Error broken down into RA and Dec.
-        for entry in data:
-            z = float(entry['zenithAngle']) * 180.0/numpy.pi
-            ra = float(entry['raError']) * 12.0/numpy.pi
-            dec = float(entry['decError']) * 180.0/numpy.pi
-            
-            ax2a.plot(z, ra*3600.0, marker='D', color='red')
-            ax2a.text(z, ra*3600.0, entry['name'])
-            ax2b.plot(z, dec*60.0, marker='s', color='red')
-            ax2b.text(z, dec*60.0, entry['name'])
+        ras = data['raError'] * 12.0/numpy.pi
+        decs = numpy.rad2deg(data['decError'])
+        ax2a.plot(zeniths, ras*3600.0, linestyle=' ', marker='D', color='red')
+        ax2b.plot(zeniths, decs*60.0, linestyle=' ', marker='s', color='red')
+        for name,z,ra,dec in zip(data['name'], zeniths, ras, decs):
+            ax2a.text(z, ra*3600.0, name)
+            ax2b.text(z, dec*60.0, name)
         ### Figure 2 (a) and (b) - Plot range and labels
         ax2a.set_xlabel('Zenith Angle [$^\\circ$]')
         ax2b.set_xlabel('Zenith Angle [$^\\circ$]')
@@ -168,30 +130,14 @@ def main(args):
         ax2b.set_ylabel('Dec Error [arc min.]')
         
         ### Figure 3 - Pointing error after optimization
-        zeniths = []
-        errors = []
-        for entry in data:
-            az = float(entry['az']) * 180.0/numpy.pi
-            el = float(entry['el']) * 180.0/numpy.pi
-            
-            azP, elP = apply_pointing_correction(az, el, bestTheta, bestPhi, bestPsi, degrees=True)
-            azP = ephem.degrees(azP * numpy.pi/180.0)
-            elP = ephem.degrees(elP * numpy.pi/180.0)
-            
-            z = float(entry['zenithAngle']) * 180.0/numpy.pi
-            e = ephem.separation((entry['correctedAz'],entry['correctedEl']), (azP,elP))
-            e *= 180.0/numpy.pi
-            ax3.plot(z, e, linestyle=' ', marker='v', color='green')
-            ax3.text(z, e, entry['name'])
-            
-            zeniths.append(z)
-            errors.append(e)
+        errors = numpy.rad2deg(_rotationSeparation(data, bestTheta, bestPhi, bestPsi))
+        ax3.plot(zeniths, errors, linestyle=' ', marker='v', color='green')
+        for name,z,e in zip(data['name'], zeniths, errors):
+            ax3.text(z, e, name)
         ### Figure 3 - Plot range and labels
         ax3.set_xlabel('Zenith Angle [$^\\circ$]')
         ax3.set_ylabel('Pointing Error [$^\\circ$]')
         ### Figure 3 - Report
-        zeniths = numpy.array(zeniths)
-        errors = numpy.array(errors)
         fit = numpy.polyfit(zeniths, errors, 1)
         print("Corrected Offsets:")
         print("  Mean Error: %.3f degrees" % errors.mean())
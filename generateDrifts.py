@@ -4,87 +4,104 @@
 Script to generate a collection of SDFs to for a pointing/sensitivity check.
 
 Usage:
-  generateRun.py [OPTIONS] <source name> YYYY/MM/DD HH:MM:SS[.SS]
+  generateDrifts.py [OPTIONS] <source name> YYYY/MM/DD HH:MM:SS[.SS]
+  generateDrifts.py [OPTIONS] -r <dates file>
 """
 
 import os
 import sys
+import copy
 import numpy
 import ephem
 import argparse
 from datetime import datetime, timedelta
 
 from lsl.common import stations
-from lsl.common import sdf
 from lsl.misc import parser as aph
 
 from analysis import getSources
 
 
-def main(args):
-    # Load in the sources and list if needed
-    srcs = getSources()
-    if args.list:
-        print("Valid Sources:")
-        print(" ")
-        print("%-8s  %11s  %11s  %6s" % ("Name", "RA", "Dec", "Epoch"))
-        print("-"*42)
-        for nm,src in srcs.items():
-            print("%-8s  %11s  %11s  %6s" % (src.name, src._ra, src._dec, src._epoch.tuple()[0]))
-        sys.exit()
+def _emitSDF(target, srcName, beam, sessionID, start, spc, flt, args):
+    """
+    Build, render, and write out the SDF for a single beam/target pointing
+    that starts at the provided datetime.  Returns the name of the SDF.
+    """
+    
+    # Deferred so that --list does not need to load the SDF module
+    from lsl.common import sdf
+    
+    az = round(target.az*180.0/numpy.pi, 1) % 360.0
+    el = round(target.alt*180.0/numpy.pi, 1)
+    sdfName = 'COMST_%s_%s_B%i.sdf' % (start.strftime("%y%m%d_%H%M"), srcName, beam)
+    
+    print("Source: %s" % target.name)
+    print("  Az: %.1f" % az)
+    print("  El: %.1f" % el)
+    print("  Beam: %i" % beam)
+    print("  SDF: %s" % sdfName)
+    
+    observer = sdf.Observer("Jayce Dowell", 99)
+    session = sdf.Session("Pointing Check Session Using %s" % srcName, sessionID)
+    project = sdf.Project(observer, "DRX Pointing Checking", "COMST", [session,])
+    project.sessions[0].drx_beam = beam
+    project.sessions[0].spcSetup = spc
+    project.sessions[0].logScheduler = False
+    project.sessions[0].logExecutive = False
+    if args.ucf_username is not None:
+        project.sessions[0].data_return_method = 'UCF'
+        project.sessions[0].ucf_username = args.ucf_username
         
-    # Read in the arguments
-    if args.source is None or args.date is None or args.time is None:
-        raise RuntimeError("Need a source name and a UTC date/time")
-    srcName = args.source
-    date = "%s %s" % (args.date, args.time)
+    obs = sdf.Stepped(target.name, "Az: %.1f degrees; El: %.1f degrees" % (az, el), start.strftime("UTC %Y/%m/%d %H:%M:%S"), flt, is_radec=False)
+    stp = sdf.BeamStep(az, el, str(args.duration), args.freqs[0], args.freqs[1], is_radec=False)
+    obs.append(stp)
+    project.sessions[0].observations.append(obs)
+    
+    s = project.render()
+    fh = open(sdfName, 'w')
+    fh.write(s)
+    fh.close()
+    
+    return sdfName
+
+
+def _generateRun(srcs, observer, srcName, dateStr, timeStr, sdfOffset, args):
+    """
+    Generate the SDFs for a single source and UTC date/time using the 
+    provided observer.  The session IDs pick up at the sdfOffset-th entry
+    of args.session_id, which is extended as needed, and the number of SDFs
+    written is returned.
+    """
+    
+    # Set the date
+    date = "%s %s" % (dateStr, timeStr)
     date = date.replace('-', '/')
     subSecondSplit = date.rfind('.')
     if subSecondSplit != -1:
         date = date[:subSecondSplit]
-        
-    # Get the site and set the date
-    observer = stations.lwa1.get_observer()
-    if args.lwasv:
-        observer = stations.lwasv.get_observer()
-    if args.lwana:
-        try:
-            observer = stations.lwana.get_observer()
-        except AttributeError:
-            ## Catch for older LSL
-            station = stations.lwa1
-            station.name = 'LWA-NA'
-            station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
-            observer = station.get_observer()
-    elif args.ovrolwa:
-        station = stations.lwa1
-        station.name = 'OVRO-LWA'
-        station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
-        observer = station.get_observer()
     observer.date = date
     
     # Find the right source
-    toUse = None
-    for src in srcs.keys():
-        if src.lower() == srcName.lower():
-            toUse = src
+    lowerNames = {src.lower(): src for src in srcs.keys()}
+    toUse = lowerNames.get(srcName.lower(), None)
     if toUse is None:
         raise RuntimeError("Unknown source '%s'" % srcName)
         
     # Calculate the position of the source at transit
-    srcs[toUse].compute(observer)
+    src = srcs[toUse]
+    src.compute(observer)
     
     # Calculate the offset pointings
     northPointing = ephem.FixedBody()
     northPointing.name = "Offset to the north"
-    northPointing._ra  = srcs[toUse]._ra
-    northPointing._dec = srcs[toUse]._dec + ephem.degrees('1:00:00')
+    northPointing._ra  = src._ra
+    northPointing._dec = src._dec + ephem.degrees('1:00:00')
     northPointing.compute(observer)
     
     southPointing = ephem.FixedBody()
     southPointing.name = "Offset to the south"
-    southPointing._ra  = srcs[toUse]._ra
-    southPointing._dec = srcs[toUse]._dec - ephem.degrees('1:00:00')
+    southPointing._ra  = src._ra
+    southPointing._dec = src._dec - ephem.degrees('1:00:00')
     southPointing.compute(observer)
     
     # Setup the times
@@ -98,13 +115,13 @@ def main(args):
     
     # Setup to deal with how LWA-SV is
     beams   = (2,3,4)								## Beams to use
-    targets = (srcs[toUse], northPointing, southPointing)	## Target list
+    targets = (src, northPointing, southPointing)	## Target list
     spc     = [1024, 6144]							## Spectrometer setup
     flt     = 7									## DRX filter code
     tstep   = timedelta(0)							## Date step between the pointings
     if args.lwasv:
         beams   = (1,1,1)								## Beams to use
-        targets = (srcs[toUse], northPointing, southPointing)	## Target list
+        targets = (src, northPointing, southPointing)	## Target list
         spc     = [1024, 6144]							## Spectrometer setup
         flt     = 7									## DRX filter code
         tstep   = timedelta(seconds=86164, microseconds=90531)	## Date step between the pointings
@@ -113,42 +130,78 @@ def main(args):
     # Make the SDFs
     sdfCount = 0
     for beam,target in zip(beams, targets):
-        if args.target_only and target != srcs[toUse]:
+        if args.target_only and target != src:
             continue
             
-        az = round(target.az*180.0/numpy.pi, 1) % 360.0
-        el = round(target.alt*180.0/numpy.pi, 1)
-        sdfName = 'COMST_%s_%s_%s_B%i.sdf' % (start.strftime("%y%m%d"), start.strftime("%H%M"), srcs[toUse].name, beam)
+        ## NOTE:  Continue the session IDs from the previous run so that the
+        ##        SDFs for a dates file do not collide
+        while len(args.session_id) <= sdfOffset + sdfCount:
+            args.session_id.append(args.session_id[-1]+1)
+        _emitSDF(target, src.name, beam, args.session_id[sdfOffset + sdfCount], start, spc, flt, args)
         
-        print("Source: %s" % target.name)
-        print("  Az: %.1f" % az)
-        print("  El: %.1f" % el)
-        print("  Beam: %i" % beam)
-        print("  SDF: %s" % sdfName)
+        sdfCount += 1
+        start += tstep
         
-        observer = sdf.Observer("Jayce Dowell", 99)
-        session = sdf.Session("Pointing Check Session Using %s" % srcs[toUse].name, args.session_id[sdfCount % len(args.session_id)])
-        project = sdf.Project(observer, "DRX Pointing Checking", "COMST", [session,])
-        project.sessions[0].drx_beam = beam
-        project.sessions[0].spcSetup = spc
-        project.sessions[0].logScheduler = False
-        project.sessions[0].logExecutive = False
-        if args.ucf_username is not None:
-            project.sessions[0].data_return_method = 'UCF'
-            project.sessions[0].ucf_username = args.ucf_username
-            
-        obs = sdf.Stepped(target.name, "Az: %.1f degrees; El: %.1f degrees" % (az, el), start.strftime("UTC %Y/%m/%d %H:%M:%S"), flt, is_radec=False)
-        stp = sdf.BeamStep(az, el, str(args.duration), args.freqs[0], args.freqs[1], is_radec=False)
-        obs.append(stp)
-        project.sessions[0].observations.append(obs)
+    return sdfCount
+
+
+def main(args):
+    # Load in the sources and list if needed
+    srcs = getSources()
+    if args.list:
+        print("Valid Sources:")
+        print(" ")
+        print("%-8s  %11s  %11s  %6s" % ("Name", "RA", "Dec", "Epoch"))
+        print("-"*42)
+        for nm,src in srcs.items():
+            print("%-8s  %11s  %11s  %6s" % (src.name, src._ra, src._dec, src._epoch.tuple()[0]))
+        sys.exit()
         
-        s = project.render()
-        fh = open(sdfName, 'w')
-        fh.write(s)
-        fh.close()
+    # Read in the arguments, either from the command line or from a file of
+    # source names and dates/times
+    if args.dates_file is not None:
+        runs = []
+        for line in args.dates_file:
+            line = line.strip()
+            if len(line) == 0 or line[0] == '#':
+                continue
+                
+            fields = line.split()
+            if len(fields) != 3:
+                raise RuntimeError("Expected a source name and a UTC date/time, found '%s'" % line)
+            try:
+                runs.append( (fields[0], aph.date(fields[1]), aph.time(fields[2])) )
+            except argparse.ArgumentTypeError:
+                raise RuntimeError("Expected a source name and a UTC date/time, found '%s'" % line)
+        args.dates_file.close()
+    else:
+        if args.source is None or args.date is None or args.time is None:
+            raise RuntimeError("Need a source name and a UTC date/time")
+        runs = [(args.source, args.date, args.time),]
         
-        sdfCount += 1
-        start += tstep
+    # Get the site
+    observer = stations.lwa1.get_observer()
+    if args.lwasv:
+        observer = stations.lwasv.get_observer()
+    if args.lwana:
+        try:
+            observer = stations.lwana.get_observer()
+        except AttributeError:
+            ## Catch for older LSL
+            station = copy.copy(stations.lwa1)
+            station.name = 'LWA-NA'
+            station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
+            observer = station.get_observer()
+    elif args.ovrolwa:
+        station = copy.copy(stations.lwa1)
+        station.name = 'OVRO-LWA'
+        station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
+        observer = station.get_observer()
+        
+    # Go!
+    sdfOffset = 0
+    for srcName,dateStr,timeStr in runs:
+        sdfOffset += _generateRun(srcs, observer, srcName, dateStr, timeStr, sdfOffset, args)
 
 
 if __name__ == "__main__":
@@ -178,9 +231,11 @@ if __name__ == "__main__":
     parser.add_argument('-t', '--target-only', action='store_true',
                         help='only generate the SDF for the target source')
     parser.add_argument('-s', '--session-id', type=aph.csv_int_list, default=[1001,1002,1003],
-                        help='comma separated list of session IDs to use')
+                        help='comma separated list of session IDs to use, counting up from the last one for any additional SDFs')
     parser.add_argument('-u', '--ucf-username', type=str,
                         help='optional UCF username for data copy')
+    parser.add_argument('-r', '--dates-file', type=argparse.FileType('r'),
+                        help='file of "<source name> YYYY/MM/DD HH:MM:SS[.SS]" lines to generate SDFs for instead of a single source and date/time')
     args = parser.parse_args()
     args.freqs[0] *= 1e6
     args.freqs[1] *= 1e6
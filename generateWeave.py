@@ -9,13 +9,13 @@ Usage:
 
 import os
 import sys
+import copy
 import ephem
 import numpy
 import argparse
 from datetime import datetime, timedelta
 
 from lsl.common import stations
-from lsl.common import sdf
 from lsl.misc import parser as aph
 
 from analysis import getSources
@@ -33,6 +33,9 @@ def main(args):
             print("%-8s  %11s  %11s  %6s" % (src.name, src._ra, src._dec, src._epoch.tuple()[0]))
         sys.exit()
         
+    # Deferred so that --list does not need to load the SDF module
+    from lsl.common import sdf
+    
     # Read in the arguments
     if args.source is None or args.date is None or args.time is None:
         raise RuntimeError("Need a source name and a UTC date/time")
@@ -52,22 +55,20 @@ def main(args):
             observer = stations.lwana.get_observer()
         except AttributeError:
             ## Catch for older LSL
-            station = stations.lwa1
+            station = copy.copy(stations.lwa1)
             station.name = 'LWA-NA'
             station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
             observer = station.get_observer()
     elif args.ovrolwa:
-        station = stations.lwa1
+        station = copy.copy(stations.lwa1)
         station.name = 'OVRO-LWA'
         station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
         observer = station.get_observer()
     observer.date = date
     
     # Find the right source
-    toUse = None
-    for src in srcs.keys():
-        if src.lower() == srcName.lower():
-            toUse = src
+    lowerNames = {src.lower(): src for src in srcs.keys()}
+    toUse = lowerNames.get(srcName.lower(), None)
     if toUse is None:
         raise RuntimeError("Unknown source '%s'" % srcName)
         
@@ -77,24 +78,23 @@ def main(args):
     az = round(src.az*180.0/numpy.pi, 1) % 360.0
     el = round(src.alt*180.0/numpy.pi, 1)
     
-    # Come up with the pattern
-    pnts = []
+    # Come up with the pattern as (RA, dec) pairs in radians
     ## Scale for whether or not it is a mini-station
     pm_range = 8.0 if args.ministation else 4.0
+    offsets = numpy.deg2rad(numpy.linspace(-pm_range, pm_range, 17))
+    nOffset = offsets.size
+    pnts = numpy.empty((2*nOffset,2))
     ## First, declination
-    for offset in numpy.linspace(-pm_range, pm_range, 17):
-        pnts.append( (src._ra, ephem.degrees(src._dec+offset*numpy.pi/180)) )
-    #pnts.extend(pnts)
-    ## Now, RA
-    for offset in numpy.linspace(-pm_range, pm_range, 17):
-        offset = offset / numpy.cos(src.dec)
-        pnts.append( (ephem.hours(src._ra+offset*numpy.pi/180), src._dec) )
-    #pnts.extend(pnts)
-    ## Finally the reference pointings
-    refs = [(src._ra,src._dec) for pnt in pnts]
-    ## Interleave
-    pnts = [(r,p) for p,r in zip(pnts,refs)]
-    pnts = [p for pair in pnts for p in pair]
+    pnts[:nOffset,0] = src._ra
+    pnts[:nOffset,1] = src._dec + offsets
+    ## Now, RA, wrapped so that sources near 0h stay within [0, 24) hours
+    pnts[nOffset:,0] = numpy.mod(src._ra + offsets / numpy.cos(src.dec), 2*numpy.pi)
+    pnts[nOffset:,1] = src._dec
+    ## Finally, interleave with the reference pointings
+    steps = numpy.empty((2*pnts.shape[0],2))
+    steps[0::2,:] = (src._ra, src._dec)
+    steps[1::2,:] = pnts
+    pnts = steps
     
     # Setup to deal with out LWA-SV is
     beam  = 2									## Beam to use
@@ -112,13 +112,14 @@ def main(args):
     start = midPoint - len(pnts)//2*tstep
     
     # Print out where we are at
-    print("Start of observations: %s" % start)
-    print("Mid-point of observation: %s" % midPoint)
-    print(" ")
+    if not args.quiet:
+        print("Start of observations: %s" % start)
+        print("Mid-point of observation: %s" % midPoint)
+        print(" ")
     
     # Make the SDF
     observer = sdf.Observer("Jayce Dowell", 99)
-    session = sdf.Session("Pointing Weave Session Using %s" % srcs[toUse].name, args.session_id)
+    session = sdf.Session("Pointing Weave Session Using %s" % src.name, args.session_id)
     project = sdf.Project(observer, "DRX Pointing Weave", "COMST", [session,])
     project.sessions[0].drx_beam = beam
     project.sessions[0].spcSetup = spc
@@ -131,19 +132,29 @@ def main(args):
     obs = sdf.Stepped(src.name, "Az: %.1f degrees; El: %.1f degrees" % (az, el), start.strftime("UTC %Y/%m/%d %H:%M:%S"), flt, is_radec=True)
     for i,(ra,dec) in enumerate(pnts):
         d = tstep
-        stp = sdf.BeamStep(ra, dec, d, args.freqs[0], args.freqs[1], is_radec=True)
+        stp = sdf.BeamStep(ephem.hours(ra), ephem.degrees(dec), d, args.freqs[0], args.freqs[1], is_radec=True)
         obs.append(stp)
     project.sessions[0].observations.append(obs)
     
     sdfName = 'COMST_%s_%s_%s_B%i.sdf' % (start.strftime("%y%m%d"), start.strftime("%H%M"), src.name, beam)
+    sdfName = os.path.join(args.output_dir, sdfName)
     s = project.render()
     fh = open(sdfName, 'w')
     fh.write(s)
     fh.close()
-    print('->', sdfName)
+    if not args.quiet:
+        print('->', sdfName)
+    
+    return sdfName
 
 
-if __name__ == "__main__":
+def parseArgs(argv=None):
+    """
+    Parse a list of command line arguments, sys.argv[1:] if None, and return
+    the argparse.Namespace for them with the tuning frequencies in Hz.  This
+    lets other scripts build the same arguments as the command line does.
+    """
+    
     parser = argparse.ArgumentParser(
         description='script to generate a basketweave SDFs for testing the pointing',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
@@ -171,8 +182,17 @@ if __name__ == "__main__":
                         help='session ID to use')
     parser.add_argument('-u', '--ucf-username', type=str,
                         help='optional UCF username for data copy')
-    args = parser.parse_args()
+    parser.add_argument('-d', '--output-dir', type=str, default='.',
+                        help='directory to write the SDF to')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report on the run that is generated')
+    args = parser.parse_args(argv)
     args.freqs[0] *= 1e6
     args.freqs[1] *= 1e6
+    return args
+
+
+if __name__ == "__main__":
+    args = parseArgs()
     main(args)
     
@@ -9,6 +9,7 @@ Usage:
 """
 
 import sys
+import ephem
 
 from analysis import parse
 
@@ -20,22 +21,28 @@ def main(args):
     data = parse(filename)
     
     # Table Header
-    print("\\begin{tabular}{|c|c|r|r|r|r|r|}")
-    print("\\hline")
-    print("Source Name & UTC Observation Midpoint & Azimuth & Elevation & RA Error & Dec. Error & SEFD\\\\")
-    print("~ & [YYYY/MM/DD HH:MM:SS] & [DDD:MM.SS.S] & [DD:MM:SS.S] & [HH:MM:SS.SS] & [DD:MM:SS.S] & [kJy] \\\\")
-    print("\\hline")
-    print("\\hline")
+    lines = []
+    lines.append("\\begin{tabular}{|c|c|r|r|r|r|r|}")
+    lines.append("\\hline")
+    lines.append("Source Name & UTC Observation Midpoint & Azimuth & Elevation & RA Error & Dec. Error & SEFD\\\\")
+    lines.append("~ & [YYYY/MM/DD HH:MM:SS] & [DDD:MM.SS.S] & [DD:MM:SS.S] & [HH:MM:SS.SS] & [DD:MM:SS.S] & [kJy] \\\\")
+    lines.append("\\hline")
+    lines.append("\\hline")
     
     # Table Contents
     for entry in data:
+        az, el = ephem.degrees(entry['az']), ephem.degrees(entry['el'])
+        raError, decError = ephem.hours(entry['raError']), ephem.degrees(entry['decError'])
         sefd = float(entry['SEFD'])/1e3
-        print("%-5s & %s & %11s & %11s & %11s & %11s & %4.1f\\\\" % (entry['name'], entry['date'], entry['az'], entry['el'], entry['raError'], entry['decError'], sefd))
+        lines.append("%-5s & %s & %11s & %11s & %11s & %11s & %4.1f\\\\" % (entry['name'], entry['date'], az, el, raError, decError, sefd))
         
     # Table Close and Caption
-    print("\\hline")
-    print("\\end{tabular}")
-    print("\\caption[Right Ascension and Declination Pointing Errors]{\\label{tab:obs}List of Drift Scan Sets used to Determine the Pointing Error}")
+    lines.append("\\hline")
+    lines.append("\\end{tabular}")
+    lines.append("\\caption[Right Ascension and Declination Pointing Errors]{\\label{tab:obs}List of Drift Scan Sets used to Determine the Pointing Error}")
+    
+    # Write out the table in one go
+    sys.stdout.write("\n".join(lines)+"\n")
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ Usage:
 """
 
 import sys
+import copy
 import ephem
 import numpy
 import argparse
@@ -35,97 +36,95 @@ def main(args):
     # Break out what we need from the arguments
     srcName = args.source
     date    = args.date
+    elevations = sorted(set(args.elevations))
     if srcName is None or date is None:
         raise RuntimeError("Need both a source name and a UTC date")
         
     # Find the right source
-    toUse = None
-    for src in srcs.keys():
-        if src.lower() == srcName.lower():
-            toUse = src
-            
+    lowerNames = {src.lower(): src for src in srcs.keys()}
+    toUse = lowerNames.get(srcName.lower(), None)
+    
     # Get the observer
     observer = stations.lwa1.get_observer()
     if args.lwasv:
         observer = stations.lwasv.get_observer()
-    elif args.lwasv:
+    elif args.lwana:
         try:
             observer = stations.lwana.get_observer()
         except AttributeError:
             ## Catch for older LSL
-            station = stations.lwa1
+            station = copy.copy(stations.lwa1)
             station.name = 'LWA-NA'
             station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
             observer = station.get_observer()
     elif args.ovrolwa:
-        station = stations.lwa1
+        station = copy.copy(stations.lwa1)
         station.name = 'OVRO-LWA'
         station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
         observer = station.get_observer()
         
     if toUse is None:
         raise RuntimeError("Cannot find source '%s'" % srcName)
-        
-    observer.date = "%s 00:00:00.000000" % date
+    src = srcs[toUse]
     
+    midnight = ephem.Date("%s 00:00:00.000000" % date)
+    observer.date = midnight
+    
+    ## NOTE:  The rising/setting/transit searches leave the source computed
+    ##        at the event time so save its position along with the time
     tRise = {}
     tSet = {}
-    for el in args.elevations:
+    for el in elevations:
         ## Reset the data and horizon
-        observer.date = "%s 00:00:00.000000" % date
+        observer.date = midnight
         observer.horizon = el
         
         ## Rise time
         try:
-            rt = observer.next_rising(srcs[toUse])
+            rt = observer.next_rising(src)
             if int(rt)-observer.date > 1:
-                rt = observer.prev_rising(srcs[toUse])
-            tRise[el] = rt
+                rt = observer.previous_rising(src)
+            tRise[el] = (rt, src.alt, src.az)
         except ephem.CircumpolarError:
             continue
             
         ## Set time
         try:
-            st = observer.next_setting(srcs[toUse])
+            st = observer.next_setting(src)
             if int(st)-observer.date > 1:
-                st = observer.prev_setting(srcs[toUse])
-            tSet[el] = st
+                st = observer.previous_setting(src)
+            tSet[el] = (st, src.alt, src.az)
         except ephem.CircumpolarError:
             continue
             
     # Reset the data and get the transit time
-    observer.date = "%s 00:00:00.000000" % date
-    tTransit = observer.next_transit(srcs[toUse])
+    observer.date = midnight
+    tTransit = observer.next_transit(src)
     if tTransit - observer.date > 1:
-        tTransit = observer.prev_transit(srcs[toUse])
-        
+        tTransit = observer.previous_transit(src)
+    elTransit = src.alt
+    
     # Report - rising then setting
-    print("%s on %s UTC:" % (srcs[toUse].name, date))
+    print("%s on %s UTC:" % (src.name, date))
     
     print("  rising")
-    for el in args.elevations:
+    for el in elevations:
         try:
-            t = tRise[el]
-            observer.date = t
-            srcs[toUse].compute(observer)
+            t, alt, az = tRise[el]
             
-            print("    el: %4.1f degrees at %s (el: %4.1f, az: %5.1f)" % (el*180/numpy.pi, t, srcs[toUse].alt*180/numpy.pi, srcs[toUse].az*180/numpy.pi))
+            print("    el: %4.1f degrees at %s (el: %4.1f, az: %5.1f)" % (el*180/numpy.pi, t, alt*180/numpy.pi, az*180/numpy.pi))
         except KeyError:
             pass
             
     print("  transit")
-    observer.date = tTransit
-    srcs[toUse].compute(observer)
-    print("    el: %4.1f degrees at %s" % (srcs[toUse].alt*180/numpy.pi, tTransit))
+    print("    el: %4.1f degrees at %s" % (elTransit*180/numpy.pi, tTransit))
     
     print("  setting")
-    for el in args.elevations[::-1]:
+    for el in elevations[::-1]:
         try:
-            t = tSet[el]
-            observer.date = t
-            srcs[toUse].compute(observer)
+            t, alt, az = tSet[el]
             
-            print("    el: %4.1f degrees at %s (el: %4.1f, az: %5.1f)" % (el*180/numpy.pi, t, srcs[toUse].alt*180/numpy.pi, srcs[toUse].az*180/numpy.pi))
+            print("    el: %4.1f degrees at %s (el: %4.1f, az: %5.1f)" % (el*180/numpy.pi, t, alt*180/numpy.pi, az*180/numpy.pi))
         except KeyError:
             pass
 
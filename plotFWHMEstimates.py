@@ -29,38 +29,35 @@ def main(args):
     # Plot
     fig = plt.figure()
     ax = fig.gca()
-    ax2 = ax.twiny()
+    ## Elevation axis tied to the zenith angle axis
+    ax2 = ax.secondary_xaxis('top', functions=(lambda z: 90-z, lambda e: 90-e))
     
     ## FWHM Estimates
+    zeniths = numpy.rad2deg(data['zenithAngle'])
+    fwhms = numpy.rad2deg(data['FWHM'])
+    valid = numpy.where( fwhms >= 0 )[0]
+    names, zeniths, fwhms = data['name'][valid], zeniths[valid], fwhms[valid]
+    
     colors = ['blue', 'green', 'red', 'cyan', 'magenta', 'black']
     colorIndex = 0
     colorMapping = {}
-    for entry in data:
-        z = float(entry['zenithAngle']) * 180.0/numpy.pi
-        fwhm = float(entry['FWHM']) * 180.0/numpy.pi
-        if fwhm < 0:
-            continue
-            
-        try:
-            c = colorMapping[entry['name']]
-        except KeyError:
-            colorMapping[entry['name']] = colors[colorIndex]
+    for name in names:
+        if name not in colorMapping:
+            colorMapping[name] = colors[colorIndex]
             colorIndex += 1
             colorIndex %= len(colors)
-            c = colorMapping[entry['name']]
-        ax.plot(z, fwhm, linestyle=' ', marker='o', color=c)
-        ax.text(z, fwhm, entry['name'])
+            
+    for name,c in colorMapping.items():
+        match = numpy.where( names == name )[0]
+        ax.plot(zeniths[match], fwhms[match], linestyle=' ', marker='o', color=c)
+    for name,z,fwhm in zip(names, zeniths, fwhms):
+        ax.text(z, fwhm, name)
         
     ## Custom labels
     ax.set_xlabel('Zenith Angle [$^\\circ$]')
     ax2.set_xlabel('Elevation [$^\\circ$]')
     ax.set_ylabel('FWHM [$^\\circ$]')
     
-    ## Fix the elevation axis range
-    xlim = ax.get_xlim()
-    xlim2 = (90-xlim[0], 90-xlim[1])
-    ax2.set_xlim(xlim2)
-    
     plt.show()
 
 
@@ -29,36 +29,34 @@ def main(args):
     # Plot
     fig = plt.figure()
     ax = fig.gca()
-    ax2 = ax.twiny()
+    ## Elevation axis tied to the zenith angle axis
+    ax2 = ax.secondary_xaxis('top', functions=(lambda z: 90-z, lambda e: 90-e))
     
     ## SEFD Estimates
+    names = data['name']
+    zeniths = numpy.rad2deg(data['zenithAngle'])
+    sefds = data['SEFD'] / 1e3
+    
     colors = ['blue', 'green', 'red', 'cyan', 'magenta', 'black']
     colorIndex = 0
     colorMapping = {}
-    for entry in data:
-        z = float(entry['zenithAngle']) * 180.0/numpy.pi
-        sefd = entry['SEFD'] / 1e3
-        
-        try:
-            c = colorMapping[entry['name']]
-        except KeyError:
-            colorMapping[entry['name']] = colors[colorIndex]
+    for name in names:
+        if name not in colorMapping:
+            colorMapping[name] = colors[colorIndex]
             colorIndex += 1
             colorIndex %= len(colors)
-            c = colorMapping[entry['name']]
-        ax.plot(z, sefd, linestyle=' ', marker='o', color=c)
-        ax.text(z, sefd, entry['name'])
+            
+    for name,c in colorMapping.items():
+        match = numpy.where( names == name )[0]
+        ax.plot(zeniths[match], sefds[match], linestyle=' ', marker='o', color=c)
+    for name,z,sefd in zip(names, zeniths, sefds):
+        ax.text(z, sefd, name)
         
     ## Custom labels
     ax.set_xlabel('Zenith Angle [$^\\circ$]')
     ax2.set_xlabel('Elevation [$^\\circ$]')
     ax.set_ylabel('SEFD [kJy]')
     
-    ## Fix the elevation axis range
-    xlim = ax.get_xlim()
-    xlim2 = (90-xlim[0], 90-xlim[1])
-    ax2.set_xlim(xlim2)
-    
     plt.show()
 
 
@@ -32,33 +32,33 @@ def main(args):
     ax3 = ax.twiny()
     
     ## Source positions across the sky
+    names = data['name']
+    tops = coord.azalt2top((data['az'], data['el']))
+    
     colors = ['blue', 'green', 'red', 'cyan', 'magenta', 'black']
     colorIndex = 0
     colorMapping = {}
-    for entry in data:
-        top = coord.azalt2top((entry['az'], entry['el']))
-        
-        try:
-            c = colorMapping[entry['name']]
-        except KeyError:
-            colorMapping[entry['name']] = colors[colorIndex]
+    for name in names:
+        if name not in colorMapping:
+            colorMapping[name] = colors[colorIndex]
             colorIndex += 1
             colorIndex %= len(colors)
-            c = colorMapping[entry['name']]
-        ax.plot(top[0], top[1], linestyle=' ', marker='o', color=c)
-        ax.text(top[0], top[1], entry['name'])
+            
+    for name,c in colorMapping.items():
+        match = numpy.where( names == name )[0]
+        ax.plot(tops[0,match], tops[1,match], linestyle=' ', marker='o', color=c)
+    for name,x,y in zip(names, tops[0], tops[1]):
+        ax.text(x, y, name)
         
     ## Horizon and lines of constant elevation
+    azs = numpy.deg2rad(numpy.arange(0, 362, 2))
     for el in (0, 20, 40, 60, 80):
-        tops = []
-        for az in xrange(0, 362, 2):
-            tops.append( coord.azalt2top((az*numpy.pi/180, el*numpy.pi/180)) )
-        tops = numpy.array(tops)
+        tops = coord.azalt2top((azs, numpy.zeros_like(azs) + el*numpy.pi/180))
         if el == 0:
             ls = '-'
         else:
             ls = ':'
-        ax.plot(tops[:,0], tops[:,1], linestyle=ls, color='black')
+        ax.plot(tops[0], tops[1], linestyle=ls, color='black')
         
     ## No tick marks
     ax.xaxis.set_major_formatter( NullFormatter() )
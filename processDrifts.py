@@ -2,50 +2,40 @@
 
 """
 Given one or more HDF5 files associated with observations generated by 
-generateRun.py, determine the current pointing offset and estimate the SEFD
+generateDrifts.py, determine the current pointing offset and estimate the SEFD
 and FWHM.
 """
 
 import os
 import sys
+import copy
 import aipy
 import h5py
 import ephem
 import numpy
 import argparse
 from datetime import datetime
+from multiprocessing import Pool, cpu_count
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.optimize import leastsq
 
 from astropy.time import Time as AstroTime
 
 from lsl import astro
 from lsl.common import stations
-from lsl.statistics import robust
 
-from analysis import getSources, getAIPYSources, fitDriftscan, fitDecOffset
+from analysis import _FOUR_LN2, getSources, getAIPYSources, fitDriftscan, fitDecOffset, findTransit
 
 
 SIDEREAL_DAY = 86164.090530833	# seconds
 
 
 def smartMod(x, y):
-    try:
-        pos = numpy.where( x >= y/2 )
-        while len(pos[0]):
-            x[pos] -= y
-            pos = numpy.where( x >= y/2 )
-        neg = numpy.where( x <= -y/2 )
-        while len(neg[0]):
-            x[neg] += y
-            neg = numpy.where( x <= -y/2 )
-            
-    except (TypeError, IndexError):
-        while x >= y:
-            x -= y
-        while x <= -y:
-            x += y
-            
-    return x
+    """
+    Wrap a value or an array of values into the range [-y/2, y/2].
+    """
+    
+    return x - y*numpy.round(x/y)
 
 
 def func(p, x):
@@ -60,7 +50,7 @@ def func(p, x):
         width  = 2.0
         offset = p[2]
     
-    y = height*numpy.exp(-4*numpy.log(2)*(x - center)**2/width**2 ) + offset
+    y = height*numpy.exp(-_FOUR_LN2*(x - center)**2/width**2 ) + offset
     return y
 
 
@@ -69,70 +59,192 @@ def err(p, x, y):
     return y - yFit 
 
 
-def main(args):
-    filenames = args.filename
+def findOutliers(x, width=201, nSigma=4.0, windowMask=None):
+    """
+    Sliding window outlier search over a time series.  For every window of
+    the given width this computes the same estimates as robust.mean and
+    robust.std, evaluated across all windows at once, and flags the points
+    more than nSigma from the mean.  Windows where windowMask is False are
+    skipped.
     
-    # Read in each of the data sets and sum the polarizations
-    data = {}
-    pointing = {}
-    tStartPlot = 1e12
-    for filename in filenames:
-        h = h5py.File(filename, 'r')
-        try:
-            sta = h.attrs['StationName']
-        except KeyError:
-            sta = None
-        obs = h.get('Observation1', None)
-        name = obs.attrs['ObservationName']
-        try:
-            name = name.decode()
-        except AttributeError:
-            pass
-        pointing[name] = obs.attrs['TargetName']
+    Returns a two-element tuple of a boolean array marking the points that
+    any window rejects and a boolean array marking the windows where both
+    estimators were defined.
+    """
+    
+    nWin = max(0, x.size - width)
+    bad = numpy.zeros(x.size, dtype=bool)
+    valid = numpy.zeros(nWin, dtype=bool)
+    if nWin == 0:
+        return bad, valid
+    windows = sliding_window_view(x, width)[:nWin]
+    if windowMask is None:
+        windowMask = numpy.ones(nWin, dtype=bool)
+        
+    ## Scale factor that robust.mean applies to its 3-sigma clipped estimate
+    cut = 3.0
+    sigmaScale = -0.15405 + 0.90723*cut - 0.23584*cut**2.0 + 0.020142*cut**3.0
+    
+    blockSize = max(1, 2**20 // width)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, nWin, blockSize):
+            block = windows[start:start+blockSize]
+            
+            ## Median and median absolute deviation used by both estimators
+            data0 = numpy.median(block, axis=1, keepdims=True)
+            absDev = numpy.abs(block - data0)
+            mad = numpy.median(absDev, axis=1, keepdims=True) / 0.6745
+            mad = numpy.where(mad < 1e-20, absDev.mean(axis=1, keepdims=True) / 0.8000, mad)
+            
+            ## robust.mean - two passes of clipping about the median
+            ## NOTE:  The sums accumulate in float64 so that a window of identical
+            ##        values has a mean exactly equal to those values
+            good = absDev <= cut*mad
+            nGood = good.sum(axis=1, keepdims=True)
+            mean = (numpy.where(good, block, 0).sum(axis=1, keepdims=True, dtype=numpy.float64) / nGood).astype(block.dtype)
+            sigma = numpy.sqrt((numpy.where(good, block - mean, 0)**2).sum(axis=1, keepdims=True) / nGood)
+            sigma /= sigmaScale
+            good = absDev <= cut*sigma
+            nGood = good.sum(axis=1, keepdims=True)
+            mean = (numpy.where(good, block, 0).sum(axis=1, keepdims=True, dtype=numpy.float64) / nGood).astype(block.dtype)
+            ok = nGood[:,0] > 3
+            
+            ## robust.std - biweight about the median
+            flat = mad[:,0] < 1e-20
+            u2 = (absDev / 6.0 / mad)**2
+            good = u2 <= 1.0
+            w = numpy.where(good, 1.0 - u2, 0)
+            numerator = (numpy.where(good, absDev, 0)**2 * w**4).sum(axis=1)
+            denominator = (w * numpy.where(good, 1.0 - 5.0*u2, 0)).sum(axis=1)
+            std = width*numerator / (denominator*(denominator - 1.0))
+            std = numpy.where((std > 0) & ~flat, numpy.sqrt(std), 0.0)
+            ok &= flat | (good.sum(axis=1) >= 3)
+            
+            ## Outliers in the usable windows
+            ok &= windowMask[start:start+block.shape[0]]
+            valid[start:start+block.shape[0]] = ok
+            reject = (numpy.abs(block - mean) > nSigma*std[:,None]) & ok[:,None]
+            i, j = numpy.nonzero(reject)
+            bad[start + i + j] = True
+            
+    return bad, valid
+
+
+def loadData(filename):
+    """
+    Read in a drift scan HDF5 file and return a dictionary with the station
+    name, the observation and target names, the times, the tuning 
+    frequencies, an index array of the integrations that were recorded, and
+    the total power summed over the inner 75% of each band.
+    """
+    
+    h = h5py.File(filename, 'r')
+    try:
+        sta = h.attrs['StationName']
+    except KeyError:
+        sta = None
+    obs = h.get('Observation1', None)
+    name = obs.attrs['ObservationName']
+    try:
+        name = name.decode()
+    except AttributeError:
+        pass
+    target = obs.attrs['TargetName']
+    try:
+        target = target.decode()
+    except AttributeError:
+        pass
+        
+    tuning1 = obs.get('Tuning1', None)
+    tuning2 = obs.get('Tuning2', None)
+    if tuning2 is None:
+        tuning2 = tuning1
+        
+    t = obs['time'][:]
+    try:
+        fmt = obs['time'].attrs['format']
+        scl = obs['time'].attrs['scale']
         try:
-            pointing[name] = pointing[name].decode()
+            fmt = fmt.decode()
+            scl = scl.decode()
         except AttributeError:
             pass
             
-        tuning1 = obs.get('Tuning1', None)
-        tuning2 = obs.get('Tuning2', None)
-        if tuning2 is None:
-            tuning2 = tuning1
+        if fmt != 'unix' or scl != 'utc':
+            t = AstroTime(t['int'], t['frac'], format=fmt, scale=scl)
+            t = t.utc.unix
             
-        t = obs['time'][:]
-        try:
-            fmt = obs['time'].attrs['format']
-            scl = obs['time'].attrs['scale']
-            try:
-                fmt = fmt.decode()
-                scl = scl.decode()
-            except AttributeError:
-                pass
+        else:
+            t = t["int"] + t["frac"]
+    except (KeyError, ValueError):
+        pass
+    f1 = tuning1['freq'][:]
+    f2 = tuning2['freq'][:]
+    try:
+        I1 = tuning1['I'][:,:]
+        I2 = tuning2['I'][:,:]
+    except KeyError:
+        ## Sum in place to avoid a third full-sized array
+        I1 = tuning1['XX'][:,:]
+        I1 += tuning1['YY'][:,:]
+        I2 = tuning2['XX'][:,:]
+        I2 += tuning2['YY'][:,:]
+    dualTuning = (tuning2 is not tuning1)
+    h.close()
+    
+    # Sum over the inner 75% of the band
+    ## NOTE:  The band is a slice so the sum runs on a view and only the 
+    ##        reduced time series is returned
+    toUseSpec = slice(f1.size//8, 7*f1.size//8)
+    I1 = I1[:,toUseSpec].sum(axis=1)
+    I2 = I2[:,toUseSpec].sum(axis=1)
+    
+    # Find the data that was actually recorded
+    ## NOTE:  Integrations that were not recorded are all zero so the band
+    ##        sums are enough to find them
+    good = numpy.flatnonzero( (t > 0) & (I1 > 0) & (I2 > 0) )[:-1]
+    
+    return {'sta': sta, 'name': name, 'target': target, 't': t, 'f1': f1, 'f2': f2, 
+            'dualTuning': dualTuning, 'good': good, 'I1': I1, 'I2': I2}
 
-            if fmt != 'unix' or scl != 'utc':
-                t = [AstroTime(*v, format=fmt, scale=scl) for v in t]
-                t = [v.utc.unix for v in t]
-                t = numpy.array(t)
+
+def main(args):
+    filenames = args.filename
+    
+    # Read in each of the data sets and sum the polarizations and the band
+    ## NOTE:  The files are independent so they are loaded in parallel when
+    ##        there is more than one
+    taskPool = None
+    if len(filenames) > 1:
+        taskPool = Pool(min(len(filenames), cpu_count()))
+        
+    data = {}
+    pointing = {}
+    tStartPlot = 1e12
+    try:
+        entries = taskPool.imap(loadData, filenames) if taskPool is not None else map(loadData, filenames)
+        for entry in entries:
+            sta = entry['sta']
+            dualTuning = entry['dualTuning']
+            name = entry['name']
+            pointing[name] = entry['target']
+            
+            if entry['t'][0] < tStartPlot:
+                tStartPlot = entry['t'][0]
                 
-            else:
-                t = t["int"] + t["frac"]
-        except (KeyError, ValueError):
-            pass
-        f1 = tuning1['freq'][:]
-        f2 = tuning2['freq'][:]
-        try:
-            I1 = tuning1['I'][:,:]
-            I2 = tuning2['I'][:,:]
-        except KeyError:
-            I1 = tuning1['XX'][:,:] + tuning1['YY'][:,:]
-            I2 = tuning2['XX'][:,:] + tuning2['YY'][:,:]
+            data[name] = entry
+    except BaseException:
+        ## NOTE:  Do not wait on the files that are still queued up if
+        ##        something went wrong
+        if taskPool is not None:
+            taskPool.terminate()
+            taskPool.join()
+        raise
+    else:
+        if taskPool is not None:
+            taskPool.close()
+            taskPool.join()
             
-        if t[0] < tStartPlot:
-            tStartPlot = t[0]
-        
-        data[name] = {'t': t, 'f1': f1, 'I1': I1, 'f2': f2, 'I2': I2}
-        h.close()
-    
     # Get the site
     if sta in (None, ''):
         sta = 'lwa1'
@@ -146,13 +258,13 @@ def main(args):
                 observer = stations.lwana.get_observer()
             except AttributeError:
                 ## Catch for older LSL
-                station = stations.lwa1
+                station = copy.copy(stations.lwa1)
                 station.name = 'LWA-NA'
                 station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
                 observer = station.get_observer()
         elif args.ovrolwa:
             sta = 'ovrolwa'
-            station = stations.lwa1
+            station = copy.copy(stations.lwa1)
             station.name = 'OVRO-LWA'
             station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
             observer = station.get_observer()
@@ -173,14 +285,14 @@ def main(args):
                 observer = stations.lwana.get_observer()
             except AttributeError:
                 ## Catch for older LSL
-                station = stations.lwa1
+                station = copy.copy(stations.lwa1)
                 station.name = 'LWA-NA'
                 station.lat, station.lon, station.elev = ('34.247', '-107.640', 2133.6)
                 observer = station.get_observer()
         elif sta == 'ovrolwa':
             print("Data appears to be from OVRO-LWA")
             sta_name = 'OVRO-LWA'
-            station = stations.lwa1
+            station = copy.copy(stations.lwa1)
             station.name = 'OVRO-LWA'
             station.lat, station.lon, station.elev = ('37.23977727', '-118.2816667', 1183.48)
             observer = station.get_observer()
@@ -191,13 +303,12 @@ def main(args):
     srcs = getSources()
     simSrcs = getAIPYSources()
         
+    lowerNames = {src.lower(): src for src in srcs.keys()}
     toUse = None
     for srcName in data.keys():
-        for src in srcs.keys():
-            if src.lower() == srcName.lower():
-                toUse = src
-                observer.date = datetime.utcfromtimestamp( data[srcName]['t'][0] )
-                break;
+        if srcName.lower() in lowerNames:
+            toUse = lowerNames[srcName.lower()]
+            observer.date = datetime.utcfromtimestamp( data[srcName]['t'][0] )
     if toUse is None:
         raise RuntimeError("Unknown source in input files")
         
@@ -219,16 +330,7 @@ def main(args):
         az = ephem.degrees(az)
         el = ephem.degrees(el)
         
-        bestT = 0.0
-        bestV = 1e6
-        for t in data[name]['t']:
-            observer.date = datetime.utcfromtimestamp(t).strftime("%Y/%m/%d %H:%M:%S")
-            srcs[toUse].compute(observer)
-            
-            sep = ephem.separation((srcs[toUse].az, srcs[toUse].alt), (az,el))
-            if sep < bestV:
-                bestT = t
-                bestV = sep
+        bestT = findTransit(observer, srcs[toUse], az, el, data[name]['t'])
     tTransit = bestT
     observer.date = datetime.utcfromtimestamp(tTransit).strftime("%Y/%m/%d %H:%M:%S")
     zenithAngle = ephem.degrees(ephem.degrees('90:00:00') - el)
@@ -248,58 +350,49 @@ def main(args):
     decPowers2 = {}
     fwhmEstimates2 = {}
     sefdEstimate2 = None
+    
+    ## Source fluxes, cached to the nearest kHz since the tunings are shared
+    ## by all of the files
+    srcFluxes = {}
+    def getSourceFlux(freq):
+        key = round(freq, -3)
+        try:
+            return srcFluxes[key]
+        except KeyError:
+            pass
+            
+        try:
+            simSrcs[toUseAIPY].compute(observer, afreqs=freq/1e9)
+            srcFlux = simSrcs[toUseAIPY].jys
+        except TypeError:
+            f0, index, Flux0 = simSrcs[toUseAIPY].mfreq, simSrcs[toUseAIPY].index, simSrcs[toUseAIPY]._jys
+            srcFlux = Flux0 * (freq/1e9 / f0)**index
+        srcFluxes[key] = srcFlux
+        return srcFlux
+        
+    cosDec = numpy.cos(srcs[toUse]._dec)
     for name in data.keys():
         t = data[name]['t']
-        f1 = data[name]['f1']
-        f2 = data[name]['f2']
-        I1 = data[name]['I1']
-        I2 = data[name]['I2']
+        f1Mean = data[name]['f1'].mean()
+        f2Mean = data[name]['f2'].mean()
         
         # Select data that was actually recorded
-        good = numpy.where( (t > 0) & (I1[:,10] > 0) & (I2[:,10] > 0) )[0][:-1]
+        good = data[name]['good']
         t = t[good]
-        I1 = I1[good,:]
-        I2 = I2[good,:]
-        
-        # Sum over the inner 75% of the band
-        toUseSpec = range(f1.size//8, 7*f1.size//8)
-        I1 = I1[:,toUseSpec].sum(axis=1)
-        I2 = I2[:,toUseSpec].sum(axis=1)
+        I1 = data[name]['I1'][good]
+        I2 = data[name]['I2'][good]
         
         # Select "good" data
-        bad1 = []
-        bad2 = []
-        for i in range(0, I1.size-201):
-            start = i
-            stop = start + 201
-            
-            try:
-                m1 = robust.mean(I1[start:stop])
-                s1 = robust.std( I1[start:stop])
-                reject = numpy.where( numpy.abs(I1[start:stop] - m1) > 4*s1 )[0]
-                for b in reject:
-                    bad1.append( b + start )
-            except:
-                continue
-            try:
-                m2 = robust.mean(I2[start:stop])
-                s2 = robust.std( I2[start:stop])
-                reject = numpy.where( numpy.abs(I2[start:stop] - m2) > 4*s2 )[0]
-                for b in reject:
-                    bad2.append( b + start )
-            except:
-                continue
-                
-        for b in bad1:
-            try:
-                I1[b] = robust.mean(I1[b-10:b+10])
-            except:
-                pass
-        for b in bad2:
-            try:
-                I2[b] = robust.mean(I2[b-10:b+10])
-            except:
-                pass
+        ## NOTE:  A window where the I1 statistics could not be computed is
+        ##        also skipped for I2
+        bad1, valid1 = findOutliers(I1, 201)
+        bad2, valid2 = findOutliers(I2, 201, windowMask=valid1)
+        
+        ## Replace the outliers by interpolating across them
+        idx = numpy.arange(I1.size)
+        for I,bad in ((I1, bad1), (I2, bad2)):
+            if bad.any() and not bad.all():
+                I[bad] = numpy.interp(idx[bad], idx[~bad], I[~bad])
         
         # Convert the scales to unit flux
         I1 /= I1.max()
@@ -328,49 +421,39 @@ def main(args):
         diff1 = obsTransit1 - tTransit
         raOffsets1[name] = smartMod(diff1, SIDEREAL_DAY)
         decPowers1[name] = obsFit1.max() - obsFit1.min()
-        fwhmEstimates1[name] = obsFWHM1/3600.*15.*numpy.cos(srcs[toUse]._dec)
+        fwhmEstimates1[name] = obsFWHM1/3600.*15.*cosDec
         
         diff2 = obsTransit2 - tTransit
         raOffsets2[name] = smartMod(diff2, SIDEREAL_DAY)
         decPowers2[name] = obsFit2.max() - obsFit2.min()
-        fwhmEstimates2[name] = obsFWHM2/3600.*15.*numpy.cos(srcs[toUse]._dec)
+        fwhmEstimates2[name] = obsFWHM2/3600.*15.*cosDec
         
         # Report
         print('Target: %s' % name)
-        print('  Tuning 1 @ %.2f MHz' % (f1.mean()/1e6,))
-        print('    FWHM: %.2f s (%.2f deg)' % (obsFWHM1, obsFWHM1/3600.*15.*numpy.cos(srcs[toUse]._dec)))
+        print('  Tuning 1 @ %.2f MHz' % (f1Mean/1e6,))
+        print('    FWHM: %.2f s (%.2f deg)' % (obsFWHM1, obsFWHM1/3600.*15.*cosDec))
         print('    Observed Transit: %s' % datetime.utcfromtimestamp(obsTransit1))
         print('    Expected Transit: %s' % datetime.utcfromtimestamp(tTransit))
         print('    -> Difference: %.2f s' % diff1)
         if toUseAIPY is None:
             print('    1/(P1/P0 - 1): %.3f' % sefdMetric1)
         else:
-            try:
-                simSrcs[toUseAIPY].compute(observer, afreqs=f1.mean()/1e9)
-                srcFlux = simSrcs[toUseAIPY].jys
-            except TypeError:
-                f0, index, Flux0 = simSrcs[toUseAIPY].mfreq, simSrcs[toUseAIPY].index, simSrcs[toUseAIPY]._jys
-                srcFlux = Flux0 * (f1.mean()/1e9 / f0)**index
+            srcFlux = getSourceFlux(f1Mean)
             sefd = srcFlux*sefdMetric1 / 1e3
             print('    S / (P1/P0 - 1): %.3f kJy' % sefd)
             if name == srcs[toUse].name:
                 sefdEstimate1 = sefd*1e3
                 
-        if tuning2 is not tuning1:
-            print('  Tuning 2 @ %.2f MHz' % (f2.mean()/1e6,))
-            print('    FWHM: %.2f s (%.2f deg)' % (obsFWHM2, obsFWHM2/3600.*15.*numpy.cos(srcs[toUse]._dec)))
+        if dualTuning:
+            print('  Tuning 2 @ %.2f MHz' % (f2Mean/1e6,))
+            print('    FWHM: %.2f s (%.2f deg)' % (obsFWHM2, obsFWHM2/3600.*15.*cosDec))
             print('    Observed Transit: %s' % datetime.utcfromtimestamp(obsTransit2))
             print('    Expected Transit: %s' % datetime.utcfromtimestamp(tTransit))
             print('    -> Difference: %.2f s' % diff2)
             if toUseAIPY is None:
                 print('    1/(P1/P0 - 1): %.3f' % sefdMetric2)
             else:
-                try:
-                    simSrcs[toUseAIPY].compute(observer, afreqs=f1.mean()/1e9)
-                    srcFlux = simSrcs[toUseAIPY].jys
-                except TypeError:
-                    f0, index, Flux0 = simSrcs[toUseAIPY].mfreq, simSrcs[toUseAIPY].index, simSrcs[toUseAIPY]._jys
-                    srcFlux = Flux0 * (f2.mean()/1e9 / f0)**index
+                srcFlux = getSourceFlux(f2Mean)
                 sefd = srcFlux*sefdMetric2 / 1e3
                 print('    S / (P1/P0 - 1): %.3f kJy' % sefd)
                 if name == srcs[toUse].name:
@@ -381,7 +464,7 @@ def main(args):
         ax1.plot(smartMod(t-tStartPlot, SIDEREAL_DAY), I1, label="%s" % name)
         ax1.plot(smartMod(t-tStartPlot, SIDEREAL_DAY), obsFit1, linestyle=':')
 
-        if tuning2 is not tuning1:
+        if dualTuning:
             ax2.plot(smartMod(t-tStartPlot, SIDEREAL_DAY), I2, label="%s" % name)		
             ax2.plot(smartMod(t-tStartPlot, SIDEREAL_DAY), obsFit2, linestyle=':')
             
@@ -389,22 +472,22 @@ def main(args):
     ax1.vlines(tTransit-tStartPlot, *ylim1, linestyle='--', label='Expected Transit')
     ax1.set_ylim(ylim1)
     ax1.legend(loc=0)
-    ax1.set_title('%.2f MHz' % (f1.mean()/1e6,))
+    ax1.set_title('%.2f MHz' % (f1Mean/1e6,))
     ax1.set_xlabel('Elapsed Time [s]')
     ax1.set_ylabel('Power [arb.]')
     
-    if tuning2 is not tuning1:
+    if dualTuning:
         ylim2 = ax2.get_ylim()
         ax2.vlines(tTransit-tStartPlot, *ylim2, linestyle='--', label='Expected Transit')
         ax2.set_ylim(ylim2)
         ax2.legend(loc=0)
-        ax2.set_title('%.2f MHz' % (f2.mean()/1e6,))
+        ax2.set_title('%.2f MHz' % (f2Mean/1e6,))
         ax2.set_xlabel('Elapsed Time [s]')
         ax2.set_ylabel('Power [arb.]')
     
     # Compute the dec. offset
-    dataSet1 = (f1.mean(), raOffsets1, decPowers1, fwhmEstimates1, sefdEstimate1)
-    dataSet2 = (f2.mean(), raOffsets2, decPowers2, fwhmEstimates2, sefdEstimate2)
+    dataSet1 = (f1Mean, raOffsets1, decPowers1, fwhmEstimates1, sefdEstimate1)
+    dataSet2 = (f2Mean, raOffsets2, decPowers2, fwhmEstimates2, sefdEstimate2)
 
     sys.stderr.write("Source YYYY/MM/DD HH:MM:SS MHz    Z          errRA      errDec      SEFD      FWHM\n")
     for f,raOffsets,decPowers,fwhmEstimates,sefdEstimate in (dataSet1, dataSet2):
@@ -448,7 +531,7 @@ def main(args):
         print("%-6s %-19s %6.3f %-10s %-10s %-10s %10.3f %-10s" % (srcs[toUse].name, datetime.utcfromtimestamp(tTransit).strftime("%Y/%m/%d %H:%M:%S"), f/1e6, zenithAngle, raOffset, decOffset, sefdEstimate, fwhmEstimate))
 
     if args.headless:
-        figname = os.path.basename(filename)
+        figname = os.path.basename(filenames[-1])
         figname = os.path.splitext(figname)[0]
         fig.savefig(figname+'.png')
     else:
@@ -457,7 +540,7 @@ def main(args):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description='given one or more HDF5 files associated with observations generated by generateRun.py, determine the current pointing offset and estimate the SEFD and FWHM',
+        description='given one or more HDF5 files associated with observations generated by generateDrifts.py, determine the current pointing offset and estimate the SEFD and FWHM',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
         )
     parser.add_argument('filename', type=str, nargs='+', 
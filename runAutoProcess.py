@@ -2,7 +2,6 @@
 
 import os
 import sys
-import glob
 import stat
 import shutil
 import getpass
@@ -25,13 +24,31 @@ SELF_DIR = os.path.abspath(os.path.dirname(__file__))
 # Where to find the DRX/HDF5 commissioning tools we need
 COM_HDF5_DIR = '/usr/local/extensions/Commissioning/DRX/HDF5/'
 
+# Which of the result upload scripts are installed alongside us
+UPLOADERS = [script for script in ('uploadSEFD.py', 'influxSEFD.py', 'influxSEFD_SV.py', 'influxSEFD_NA.py') \
+             if os.path.exists(os.path.join(SELF_DIR, script))]
+
+
+def startConversion(meta, data):
+    """
+    Start the HDF5 conversion of a data file in the background and return
+    the subprocess.Popen instance for it.
+    """
+    
+    cmd = [sys.executable, os.path.join(COM_HDF5_DIR, 'drspec2hdf.py'), '-m', meta, data]
+    return subprocess.Popen(cmd, cwd=SEARCH_DIR)
+
 
 def main(args):
     # Find the two most recent metadata files
-    metadata = glob.glob(os.path.join(SEARCH_DIR, '*.tgz'))
-    metadata.sort(key=lambda x: os.path.getmtime(x))
-    metadata = metadata[-3:]
+    ## NOTE:  The directory entries carry their own stat results so each file
+    ##        is only stat'd once.  Hidden files are skipped to match glob.
+    entries = [entry for entry in os.scandir(SEARCH_DIR) if entry.name.endswith('.tgz') and not entry.name.startswith('.')]
+    entries.sort(key=lambda x: x.stat().st_mtime)
+    metadata = [entry.path for entry in entries[-3:]]
     
+    # Check the metadata and data files
+    ready = []
     for meta in metadata:
         ## Load in the metadata
         is_lwana = False
@@ -58,68 +75,99 @@ def main(args):
         
         ## Make sure the data are ready
         data = os.path.join(SEARCH_DIR, smd[1]['tag'])
-        if not os.path.exists(data):
+        try:
+            dstat = os.stat(data)
+        except OSError:
             print(f"WARNING: No data file found for {os.path.basename(meta)}, skipping")
             continue
-        if not bool(os.stat(data).st_mode & stat.S_IROTH):
+        if not bool(dstat.st_mode & stat.S_IROTH):
             print(f"WARNING: Data file not finished copying for {os.path.basename(meta)}, skipping")
             continue
-        if os.path.getsize(data) == 0:
+        if dstat.st_size == 0:
             print(f"WARNING: Data file for {os.path.basename(meta)} appears to be empty, skipping")
             continue
             
-        ## Convert
-        cmd = [sys.executable, os.path.join(COM_HDF5_DIR, 'drspec2hdf.py'), '-m', meta, data]
-        try:
-            subprocess.check_call(cmd, cwd=SEARCH_DIR)
-        except subprocess.CalledProcessError as e:
-            print(f"WARNING:  Failed to build HDF5 file for {os.path.basename(meta)} - {e}")
-            continue
-            
-        ## Analyze and report
-        cmd = [sys.executable, os.path.join(SELF_DIR, 'processWeave.py'), '--headless', data+'-waterfall.hdf5']
-        try:
-            output = subprocess.check_output(cmd, cwd=SELF_DIR)
-        except subprocess.CalledProcessError as e:
-            print(f"WARNING:  Failed to analyze HDF5 file {os.path.basename(meta)} - {e}")
-            continue
-        output = output.decode()
-        lines = output.split('\n')
-        for line in lines:
-            print(f"  {line}")
-            
-        ## Record
-        outname = os.path.join(SELF_DIR, 'metric-')
-        outname += oname
-        with open(outname, 'a') as fh:
-            fh.write(output)
-        figname = os.path.basename(data)
-        figname = os.path.splitext(figname)[0]
-        figname += '-waterfall.png'
-        newname = os.path.join(SEARCH_DIR, figname)
-        figname = os.path.join(SELF_DIR, figname)
-        try:
-            shutil.move(figname, newname)
-        except OSError:
-            print(f"WARNING: Failed to move output image {os.path.basename(figname)}")
-            
-        ## Upload to the OpScreen page
-        for script in ('uploadSEFD.py', 'influxSEFD.py', 'influxSEFD_SV.py', 'influxSEFD_NA.py'):
-            cmd = [sys.executable, os.path.join(SELF_DIR, script),]
-            if not os.path.exists(cmd[0]):
+        ready.append( (meta, data, oname) )
+        
+    # Convert, analyze, and report
+    ## NOTE:  The conversion of the next file is started as soon as the current
+    ##        one finishes so that it overlaps with the analysis and upload of
+    ##        the current file
+    conversions = [None for job in ready]
+    if len(ready) > 0:
+        conversions[0] = startConversion(*ready[0][:2])
+    metrics = {}
+    try:
+        for i,(meta,data,oname) in enumerate(ready):
+            ## Wait on the conversion and start the next one
+            status = conversions[i].wait()
+            if i+1 < len(ready):
+                conversions[i+1] = startConversion(*ready[i+1][:2])
+            if status != 0:
+                e = subprocess.CalledProcessError(status, conversions[i].args)
+                print(f"WARNING:  Failed to build HDF5 file for {os.path.basename(meta)} - {e}")
                 continue
                 
+            ## Analyze and report
+            cmd = [sys.executable, os.path.join(SELF_DIR, 'processWeave.py'), '--headless', data+'-waterfall.hdf5']
             try:
-                subprocess.check_call(cmd, cwd=SELF_DIR)
+                output = subprocess.check_output(cmd, cwd=SELF_DIR, text=True)
             except subprocess.CalledProcessError as e:
-                print(f"WARNING: failed to upload results to the OpScreen page with {script} - {e}")
+                print(f"WARNING:  Failed to analyze HDF5 file {os.path.basename(meta)} - {e}")
+                continue
+            sys.stdout.write("".join(f"  {line}\n" for line in output.splitlines()))
                 
-        ## Cleanup
-        for filename in (meta, data):
+            ## Record
+            outname = os.path.join(SELF_DIR, 'metric-')
+            outname += oname
+            ## NOTE:  The uploaders read this file so it is flushed after each write
+            try:
+                fh = metrics[outname]
+            except KeyError:
+                fh = open(outname, 'a')
+                metrics[outname] = fh
+            fh.write(output)
+            fh.flush()
+            figname = os.path.basename(data)
+            figname = os.path.splitext(figname)[0]
+            figname += '-waterfall.png'
+            newname = os.path.join(SEARCH_DIR, figname)
+            figname = os.path.join(SELF_DIR, figname)
             try:
-                os.unlink(filename)
+                shutil.move(figname, newname)
             except OSError:
-                print(f"WARNING: Failed to remove {os.path.basename(filename)}")
+                print(f"WARNING: Failed to move output image {os.path.basename(figname)}")
+                
+            ## Upload to the OpScreen page
+            ## NOTE:  The uploaders are independent so they are all started
+            ##        before waiting on any of them
+            uploads = []
+            for script in UPLOADERS:
+                cmd = [sys.executable, os.path.join(SELF_DIR, script),]
+                uploads.append( (script, subprocess.Popen(cmd, cwd=SELF_DIR)) )
+            for script,upload in uploads:
+                status = upload.wait()
+                if status != 0:
+                    e = subprocess.CalledProcessError(status, upload.args)
+                    print(f"WARNING: failed to upload results to the OpScreen page with {script} - {e}")
+                    
+            ## Cleanup
+            for filename in (meta, data):
+                try:
+                    os.unlink(filename)
+                except OSError:
+                    print(f"WARNING: Failed to remove {os.path.basename(filename)}")
+                    
+    finally:
+        for fh in metrics.values():
+            fh.close()
+            
+        ## Make sure that no conversion is left running in the background if
+        ## we are leaving early
+        for conversion in conversions:
+            if conversion is not None and conversion.poll() is None:
+                conversion.terminate()
+                conversion.wait()
 
 
 if __name__ == '__main__':
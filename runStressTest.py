@@ -9,7 +9,6 @@ import os
 import sys
 import math
 import argparse
-import subprocess
 from datetime import datetime, timedelta
 from socket import gethostname
 
@@ -26,6 +25,7 @@ from lwa_mcs.utils import schedule_at_command
 from lwa_mcs.exc import cancel_observation
 
 from analysis import getSources
+import generateWeave
 
 
 # Obsever and project information
@@ -40,17 +40,23 @@ _IS_LWASV = gethostname().lower().find('lwasv') != -1
 _IS_LWANA = gethostname().lower().find('lwana') != -1
 
 
+# Where we come from
+_SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
 def main(args):
     # Get the start and stop times for the window that we are scheduling
     start = datetime.strptime('%s %s' % (args.start_date, args.start_time), '%Y/%m/%d %H:%M:%S')
     stop  = datetime.strptime('%s %s' % (args.stop_date, args.stop_time), '%Y/%m/%d %H:%M:%S')
-    print("Scheduling stress test for %s to %s" % (start.strftime('%Y/%m/%d %H:%M:%S'),  
-                                                   stop.strftime('%Y/%m/%d %H:%M:%S')))
+    start_str = start.strftime('%Y/%m/%d %H:%M:%S')
+    stop_str = stop.strftime('%Y/%m/%d %H:%M:%S')
+    print("Scheduling stress test for %s to %s" % (start_str, stop_str))
     print("  Window is %.1f min long" % ((stop-start).total_seconds()/60.0,))
     
     # Find the mid-point
     mid = start + (stop-start)/2
-    print("  Mid-point is %s" % (mid.strftime('%Y/%m/%d %H:%M:%S'),))
+    mid_str = mid.strftime('%Y/%m/%d %H:%M:%S')
+    print("  Mid-point is %s" % (mid_str,))
     
     # Tweak the mid-point to get closer to transit
     cyga = getSources()['CygA']
@@ -59,15 +65,16 @@ def main(args):
         site = stations.lwasv
     elif _IS_LWANA:
         site = stations.lwana
-    site.date = mid.strftime('%Y/%m/%d %H:%M:%S')
+    site.date = mid_str
     cyga.compute(site)
     diff = cyga.ra - site.sidereal_time()
     mid += timedelta(seconds=int(round(diff*12*3600 / math.pi)))
-    print("  Transit is %s" % (mid.strftime('%Y/%m/%d %H:%M:%S'),))
+    mid_date, mid_time = mid.strftime("%Y/%m/%d"), mid.strftime("%H:%M:%S")
+    print("  Transit is %s %s" % (mid_date, mid_time))
     
     # Load in the next session ID
     try:
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'), 'r')
+        fh = open(os.path.join(_SELF_DIR, 'state'), 'r')
         line = fh.read()
         old_project_id, session_id = line.split(None, 1)
         session_id = int(session_id, 10)
@@ -86,20 +93,18 @@ def main(args):
             os.mkdir(sdf_dir)
             
     # Generate the run and get the filename
+    ## NOTE:  This is done in-process but the equivalent command is kept for
+    ##        the log
     cmd = [sys.executable, './generateWeave.py', '-s', str(session_id), '-u', 'stress_tests']
     if _IS_LWASV:
         cmd.append('-v')
     elif _IS_LWANA:
         cmd.append('-n')
         cmd.append('-m')
-    cmd.extend(['CygA', mid.strftime("%Y/%m/%d"), mid.strftime("%H:%M:%S")])
-    output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL,
-                                     cwd=os.path.abspath(os.path.dirname(__file__)))
-    output = output.decode()
-    output = output.split('\n')
-    filename = output[-2].split(None, 1)[1]
-    newname = os.path.join(sdf_dir, filename)
-    filename = os.path.join(os.path.abspath(os.path.dirname(__file__)), filename)
+    cmd.extend(['-d', _SELF_DIR, '-q', 'CygA', mid_date, mid_time])
+    weaveArgs = generateWeave.parseArgs(cmd[2:])
+    filename = generateWeave.main(weaveArgs)
+    newname = os.path.join(sdf_dir, os.path.basename(filename))
     
     # Parse it to get an "official" start/stop time
     parser = sdf
@@ -121,6 +126,7 @@ def main(args):
     else:
         os.unlink(filename)
     filenames = [newname,]
+    fileids = [session_id,]
     session_id += 1
     
     # Submit the SDFs
@@ -135,14 +141,15 @@ def main(args):
             print("schedule_sdfs() failed with '%s'" % str(scheduling_error))
         bi.stop()
         if not success:
-            fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime.log'), 'a')
-            fh.write("Failed Scheduling for UTC %s to %s\n" % (start.strftime('%Y/%m/%d %H:%M:%S'), 
-                                                               stop.strftime('%Y/%m/%d %H:%M:%S')))
-            fh.write("  Scheduling Error:\n")
+            ## NOTE:  The entry is written in one go so that it is a single append
+            lines = ["Failed Scheduling for UTC %s to %s" % (start_str, stop_str),]
+            lines.append("  Scheduling Error:")
             try:
-                fh.write("    %s\n" % scheduling_error)
+                lines.append("    %s" % scheduling_error)
             except NameError:
-                fh.write("    Too many failed attempts to schedule\n")
+                lines.append("    Too many failed attempts to schedule")
+            fh = open(os.path.join(_SELF_DIR, 'runtime.log'), 'a')
+            fh.write("\n".join(lines)+"\n")
             fh.close()
             
             for fileid in fileids:
@@ -159,7 +166,7 @@ def main(args):
     print("SDFs successfully scheduled")
     if not args.dry_run:
         # Write out new session id
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'), 'w')
+        fh = open(os.path.join(_SELF_DIR, 'state'), 'w')
         fh.write("%s %i\n" % (_PROJECT_ID, session_id))
         fh.close()
         
@@ -201,14 +208,15 @@ def main(args):
         rpt.append( [test_stop, f"stress tests stops on beam {test_beam}"] )
         rpt.sort()
         
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime.log'), 'a')
-        fh.write("Completed Scheduling for UTC %s to %s\n" % (start.strftime('%Y/%m/%d %H:%M:%S'), 
-                                                              stop.strftime('%Y/%m/%d %H:%M:%S')))
-        fh.write("  Command:\n")
-        fh.write("    %s\n" % (' '.join(cmd),))
-        fh.write("  Timeline:\n")
+        ## NOTE:  The entry is written in one go so that it is a single append
+        lines = ["Completed Scheduling for UTC %s to %s" % (start_str, stop_str),]
+        lines.append("  Command:")
+        lines.append("    %s" % (' '.join(cmd),))
+        lines.append("  Timeline:")
         for t,info in rpt:
-            fh.write("    %s - %s\n" % (t.strftime("%Y/%m/%d %H:%M:%S"), info))
+            lines.append("    %s - %s" % (t.strftime("%Y/%m/%d %H:%M:%S"), info))
+        fh = open(os.path.join(_SELF_DIR, 'runtime.log'), 'a')
+        fh.write("\n".join(lines)+"\n")
         fh.close()
 
 
@@ -3,15 +3,25 @@
 import os
 import sys
 import json
-import pytz
-from datetime import datetime
+from datetime import datetime, timezone
+from multiprocessing.pool import ThreadPool
 
 from lwa_auth import KEYS as LWA_AUTH_KEYS
 from lwa_auth.signed_requests import post as signed_post
 
 URL = "https://lwalab.phys.unm.edu/OpScreen/update"
 
-UTC = pytz.utc
+# Key used to sign the uploads
+SIGNING_KEY = LWA_AUTH_KEYS.get('lwaucf', kind='private')
+
+# Where to keep track of the metric file versions that have been uploaded
+_STATE_FILE = 'uploadSEFD.state'
+
+# How much of the end of each metric file to read when looking for the most
+# recent result
+_TAIL_SIZE = 8192
+
+UTC = timezone.utc
 
 
 def _serialize_datetime(value):
@@ -23,27 +33,101 @@ def _serialize_datetime(value):
         return value
 
 
-def main(args):
-    for site in ('lwa1', 'lwasv', 'lwana'):
-        with open('metric-%s' % site, 'r') as fh:
-            for line in fh:
-                line = line.strip().rstrip()
-            line = line.split()
-            
-            data = []
-            data.append({'source':     line[0],
-                         'zenith_ang': line[4],
-                         'frequency':  float(line[3]),
-                         'err_ra':     line[5],
-                         'err_dec':    line[6],
-                         'sefd':       float(line[7]),
-                         'fwhm':       line[8],
-                         'updated':    datetime.strptime(f"{line[1]} {line[2]}", "%Y/%m/%d %H:%M:%S")})
+def loadUploadState():
+    """
+    Load the modification times, in ns, of the metric files at their last
+    upload and return them as a dictionary keyed by site.
+    """
+    
+    state = {}
+    try:
+        fh = open(_STATE_FILE, 'r')
+        for line in fh:
+            site, mtime = line.split()
+            state[site] = int(mtime, 10)
+        fh.close()
+    except (IOError, ValueError):
+        pass
+    return state
+
+
+def saveUploadState(state):
+    """
+    Save a dictionary of metric file modification times, in ns, keyed by
+    site.
+    """
+    
+    ## NOTE:  The file is replaced in one step so that it is never partially
+    ##        written
+    fh = open(_STATE_FILE+'.tmp', 'w')
+    for site in sorted(state.keys()):
+        fh.write("%s %i\n" % (site, state[site]))
+    fh.close()
+    os.replace(_STATE_FILE+'.tmp', _STATE_FILE)
+
+
+def uploadSite(site, lastUpload=None):
+    """
+    Upload the latest SEFD result for the given site to the OpScreen page if
+    the metric file has changed since lastUpload, its modification time in
+    ns at the last upload.  Return the modification time of the metric file
+    or None if there was nothing to upload.
+    """
+    
+    # Find the most recent result
+    ## NOTE:  The metric files are only ever appended to so the last entry
+    ##        is read from the end of the file
+    with open('metric-%s' % site, 'rb') as fh:
+        mtime = os.fstat(fh.fileno()).st_mtime_ns
+        if mtime == lastUpload:
+            return mtime
             
-            out = json.dumps(data, default=_serialize_datetime)
-            f = signed_post(LWA_AUTH_KEYS.get('lwaucf', kind='private'), URL,
-                            data={'site': site, 'subsystem': 'SEFD', 'data': out})
-            f.close()
+        fh.seek(0, os.SEEK_END)
+        fh.seek(max(0, fh.tell()-_TAIL_SIZE))
+        lines = fh.read().decode(errors='ignore').splitlines()
+    line = []
+    for entry in reversed(lines):
+        line = entry.split()
+        if len(line) > 0:
+            break
+    if len(line) == 0:
+        return None
+    
+    data = []
+    data.append({'source':     line[0],
+                 'zenith_ang': line[4],
+                 'frequency':  float(line[3]),
+                 'err_ra':     line[5],
+                 'err_dec':    line[6],
+                 'sefd':       float(line[7]),
+                 'fwhm':       line[8],
+                 'updated':    datetime.fromisoformat(f"{line[1].replace('/', '-')} {line[2]}")})
+    
+    out = json.dumps(data, default=_serialize_datetime)
+    f = signed_post(SIGNING_KEY, URL,
+                    data={'site': site, 'subsystem': 'SEFD', 'data': out})
+    f.close()
+    
+    return mtime
+
+
+def main(args):
+    # Upload the sites in parallel since each is a separate request, skipping
+    # any whose metric file has not changed since the last upload
+    sites = ('lwa1', 'lwasv', 'lwana')
+    state = loadUploadState()
+    taskPool = ThreadPool(len(sites))
+    try:
+        mtimes = taskPool.starmap(uploadSite, [(site, state.get(site, None)) for site in sites])
+    finally:
+        taskPool.close()
+        taskPool.join()
+        
+    # Save what was uploaded
+    for site,mtime in zip(sites, mtimes):
+        if mtime is not None:
+            state[site] = mtime
+    saveUploadState(state)
 
 
 if __name__ == '__main__':